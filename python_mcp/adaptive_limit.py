@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Adaptive Upstream Concurrency
+
+Limits concurrent requests to each upstream API (Open-Meteo, Nominatim) with
+a limit that finds its own level, AIMD style:
+
+- additive increase: while the limit is actually in use and latency stays
+  near the baseline, it grows by about one per limit's worth of calls;
+- multiplicative decrease: an overload signal (429, 5xx, timeout, connection
+  or geocoder service error) halves it, and latency inflated past
+  LATENCY_TOLERANCE x baseline trims it by 10%, at most once per round trip.
+
+The baseline is the lowest latency seen over the last one to two minutes, so
+a lasting shift in upstream latency is accepted as normal once it has held
+that long. A congested upstream still shows its baseline latency whenever the
+limit has backed off far enough.
+
+A concurrency limit does not bound the request rate: one slot held by fast
+requests sends many per second. An upstream with a published rate limit
+(Nominatim: one request per second) also gets a RateGate, which spaces its
+requests out in arrival order and fails a call whose deadline would pass
+before its turn.
+
+Reported on /metrics as mcp_upstream_concurrency_limit, mcp_upstream_in_flight,
+mcp_upstream_queue_wait_seconds, mcp_upstream_limit_changes_total and
+mcp_upstream_pace_wait_seconds, and as JSON, with the recent history of the
+limit, on GET /upstream/limits.
+
+Configured from the environment:
+    MCP_UPSTREAM_MAX_CONCURRENCY  ceiling per upstream, e.g. "open-meteo=64,nominatim=2"
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from admission import parse_limits
+from deadlines import DeadlineExceeded, time_left
+from metrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger("adaptive-limit")
+
+REGISTRY.describe("upstream_concurrency_limit", "Current adaptive concurrency limit per upstream.")
+REGISTRY.describe("upstream_in_flight", "Outbound requests currently in flight per upstream.")
+REGISTRY.describe("upstream_queue_wait_seconds", "Time spent waiting for an upstream concurrency slot.")
+REGISTRY.describe("upstream_limit_changes_total", "Adaptive limit changes per upstream, by direction and cause.")
+REGISTRY.describe("upstream_pace_wait_seconds", "Time spent waiting for a turn under an upstream's rate limit.")
+
+ERROR_BACKOFF = 0.5
+LATENCY_BACKOFF = 0.9
+LATENCY_TOLERANCE = 2.0
+LATENCY_EWMA_WEIGHT = 0.1
+# The baseline is the lowest latency over the current and previous window
+BASELINE_WINDOW = 60.0
+HISTORY_LENGTH = 100
+
+# Every limiter in the process by upstream name, for GET /upstream/limits
+LIMITERS: dict[str, "AdaptiveLimiter"] = {}
+
+
+def is_overload(error: BaseException) -> bool:
+    """Whether a failed upstream call says "slow down" rather than "bad request"."""
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    # Timeouts, connection failures, geocoder service errors; not our own bugs
+    return not isinstance(error, (ValueError, TypeError, KeyError))
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for one upstream, with a FIFO wait queue."""
+
+    def __init__(
+        self,
+        target: str,
+        initial: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        registry: MetricsRegistry = REGISTRY,
+    ):
+        self.target = target
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, int(parse_limits(os.environ.get("MCP_UPSTREAM_MAX_CONCURRENCY", "")).get(target, max_limit)))
+        self.limit = float(min(max(initial, min_limit), self.max_limit))
+        self.registry = registry
+        self.in_flight = 0
+        self.latency: float | None = None
+        self._window_min: float | None = None
+        self._previous_min: float | None = None
+        self._window_start = time.monotonic()
+        self.history: deque[dict] = deque(maxlen=HISTORY_LENGTH)
+        self._waiters: deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        LIMITERS[target] = self
+        self._record("initial")
+
+    @property
+    def current(self) -> int:
+        return int(self.limit)
+
+    @property
+    def baseline(self) -> float | None:
+        candidates = [m for m in (self._window_min, self._previous_min) if m is not None]
+        return min(candidates) if candidates else None
+
+    def _track_baseline(self, latency: float) -> None:
+        now = time.monotonic()
+        if now - self._window_start >= BASELINE_WINDOW:
+            self._previous_min, self._window_min = self._window_min, None
+            self._window_start = now
+        if self._window_min is None or latency < self._window_min:
+            self._window_min = latency
+
+    def _record(self, cause: str) -> None:
+        self.history.append({"time": round(time.time(), 3), "limit": self.current, "cause": cause})
+        self.registry.set_gauge("upstream_concurrency_limit", self.current, target=self.target)
+
+    def _set_limit(self, value: float, direction: str, cause: str) -> None:
+        before = self.current
+        self.limit = min(max(value, self.min_limit), self.max_limit)
+        if self.current != before:
+            self.registry.inc("upstream_limit_changes_total", target=self.target, direction=direction, cause=cause)
+            self._record(cause)
+            logger.info("%s concurrency limit %d -> %d (%s)", self.target, before, self.current, cause)
+        self._wake()
+
+    def _decrease(self, factor: float, cause: str) -> None:
+        now = time.monotonic()
+        # One decrease per round trip: the calls already in flight were sent
+        # under the old limit and will report the same congestion
+        if now - self._last_decrease < (self.latency or 0.0):
+            return
+        self._last_decrease = now
+        self._set_limit(self.limit * factor, "down", cause)
+
+    def observe(self, latency: float, overloaded: bool, saturated: bool) -> None:
+        """Feed one completed call into the control loop."""
+        if overloaded:
+            self._decrease(ERROR_BACKOFF, "error")
+            return
+        self._track_baseline(latency)
+        self.latency = latency if self.latency is None else self.latency + LATENCY_EWMA_WEIGHT * (latency - self.latency)
+        if self.latency > LATENCY_TOLERANCE * self.baseline:
+            self._decrease(LATENCY_BACKOFF, "latency")
+        elif saturated and self.limit < self.max_limit:
+            # Only grow a limit that is actually being used
+            self._set_limit(self.limit + 1 / self.limit, "up", "probe")
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self.current:
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.current and not self._waiters:
+            self.in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        start = time.perf_counter()
+        try:
+            await future
+        except BaseException:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(future)
+                except ValueError:
+                    pass
+            raise
+        finally:
+            self.registry.observe("upstream_queue_wait_seconds", time.perf_counter() - start, target=self.target)
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one upstream slot for the body and feed its latency and outcome back."""
+        await self.acquire()
+        self.registry.set_gauge("upstream_in_flight", self.in_flight, target=self.target)
+        saturated = self.in_flight >= self.current
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            # A rejected request (400, 404, ...) says nothing about upstream load,
+            # nor does a timeout cut short by the caller's own deadline
+            left = time_left()
+            if is_overload(e) and (left is None or left > 0):
+                self.observe(time.perf_counter() - start, overloaded=True, saturated=saturated)
+            raise
+        else:
+            self.observe(time.perf_counter() - start, overloaded=False, saturated=saturated)
+        finally:
+            self.release()
+            self.registry.set_gauge("upstream_in_flight", self.in_flight, target=self.target)
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.current,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "baseline_seconds": self.baseline,
+            "latency_seconds": self.latency,
+            "history": list(self.history),
+        }
+
+
+class RateGate:
+    """Spaces the requests to one upstream at least 1 / rate seconds apart, in arrival order."""
+
+    def __init__(self, target: str, rate: float, registry: MetricsRegistry = REGISTRY):
+        self.target = target
+        self.rate = rate
+        self.registry = registry
+        # When the next request may start
+        self._next = float("-inf")
+
+    async def wait(self) -> None:
+        """Wait for this request's turn; DeadlineExceeded if the call's deadline comes first."""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        turn = max(now, self._next)
+        left = time_left()
+        if left is not None and turn - now > left:
+            raise DeadlineExceeded(f"{self.target} allows {self.rate:g} requests per second; no turn before the deadline")
+        self._next = turn + 1 / self.rate
+        self.registry.observe("upstream_pace_wait_seconds", turn - now, target=self.target)
+        if turn <= now:
+            return
+        try:
+            await asyncio.sleep(turn - now)
+        except asyncio.CancelledError:
+            # Give the turn back unless a later request has already been queued behind it
+            if self._next == turn + 1 / self.rate:
+                self._next = turn
+            raise
+
+
+def expose_limits(app) -> None:
+    """GET /upstream/limits: every adaptive limiter's state and recent history."""
+
+    @app.custom_route("/upstream/limits", methods=["GET"])
+    async def upstream_limits(request: Request) -> JSONResponse:
+        return JSONResponse({target: limiter.snapshot() for target, limiter in LIMITERS.items()})
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Admission Control
+
+Bounds how many tool calls a server runs at once, so a burst degrades into
+quick, explicit "retry later" answers instead of every caller timing out:
+
+- a server-wide limit, plus optional per-tool limits (e.g. get-forecast,
+  which holds an upstream connection for its whole duration);
+- calls over a limit wait in a bounded FIFO queue, for at most the queue
+  timeout;
+- a call that finds the queue full, or outwaits the timeout, is shed with an
+  error result carrying `retry_after` seconds, estimated from how long slots
+  are currently held.
+
+Reported on /metrics as mcp_admission_active, mcp_admission_queue_depth,
+mcp_admission_wait_seconds and mcp_admission_shed_total.
+
+Configured from the environment:
+    MCP_MAX_CONCURRENCY   tool calls running at once per server (default 64; 0: no server-wide limit)
+    MCP_TOOL_CONCURRENCY  per-tool limits, e.g. "get-forecast=8,power=4"
+                          (added to, and overriding, the server's defaults; 0 removes one)
+    MCP_MAX_QUEUE         calls waiting per limit before new ones are shed (default 128)
+    MCP_QUEUE_TIMEOUT_MS  longest a call waits for a slot (default 5000)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator
+
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from fastmcp.tools import ToolResult
+
+from metrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger("admission")
+
+REGISTRY.describe("admission_active", "Tool calls holding a concurrency slot.")
+REGISTRY.describe("admission_queue_depth", "Tool calls waiting for a concurrency slot.")
+REGISTRY.describe("admission_wait_seconds", "Time queued calls waited for a slot.")
+REGISTRY.describe("admission_shed_total", "Tool calls rejected as overloaded, by reason.")
+
+# Weight of the latest call in the moving average of slot hold time
+HOLD_EWMA_WEIGHT = 0.2
+MIN_RETRY_AFTER = 0.1
+
+
+class Overloaded(Exception):
+    """Raised when a call cannot get a slot; carries the retry hint."""
+
+    def __init__(self, limiter: "Limiter", reason: str):
+        self.scope = limiter.scope
+        self.reason = reason
+        self.retry_after = limiter.retry_after()
+        super().__init__(f"{self.scope} limit, {reason.replace('_', ' ')}")
+
+
+class Limiter:
+    """A concurrency limit with a bounded FIFO wait queue and a queue timeout."""
+
+    def __init__(
+        self,
+        server: str,
+        scope: str,
+        limit: int,
+        max_queue: int = 128,
+        queue_timeout: float = 5.0,
+        registry: MetricsRegistry = REGISTRY,
+    ):
+        self.server = server
+        self.scope = scope
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.registry = registry
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        # Moving average of how long a call holds its slot, for retry hints
+        self._hold = 0.05
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> float:
+        """Seconds until the calls queued now should have drained."""
+        return round(max(MIN_RETRY_AFTER, self._hold * (self.waiting + 1) / self.limit), 2)
+
+    def _report(self) -> None:
+        self.registry.set_gauge("admission_active", self.active, server=self.server, scope=self.scope)
+        self.registry.set_gauge("admission_queue_depth", self.waiting, server=self.server, scope=self.scope)
+
+    def _shed(self, reason: str) -> Overloaded:
+        self.registry.inc("admission_shed_total", server=self.server, scope=self.scope, reason=reason)
+        return Overloaded(self, reason)
+
+    async def acquire(self) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self._report()
+            return
+        if self.waiting >= self.max_queue:
+            raise self._shed("queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._report()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # A slot was handed over just as the wait ended: pass it on
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(future)
+                except ValueError:
+                    pass
+            self._report()
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._shed("queue_timeout") from None
+            raise
+        self.registry.observe("admission_wait_seconds", time.perf_counter() - start, server=self.server, scope=self.scope)
+        self._report()
+
+    def release(self) -> None:
+        # Hand the slot straight to the next waiter, so a newcomer cannot overtake the queue
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+        self._report()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._hold += HOLD_EWMA_WEIGHT * (time.perf_counter() - start - self._hold)
+            self.release()
+
+
+def overloaded_result(error: Overloaded) -> ToolResult:
+    """The error result returned for a shed call."""
+    return ToolResult(
+        content=f"Error: Server overloaded ({error}), retry after {error.retry_after:g}s",
+        structured_content={
+            "error": "overloaded",
+            "reason": error.reason,
+            "scope": error.scope,
+            "retry_after": error.retry_after,
+        },
+        is_error=True,
+    )
+
+
+class AdmissionMiddleware(Middleware):
+    """Runs each tool call inside its tool's slot (if limited) and a server slot."""
+
+    def __init__(self, server: Limiter | None, tools: dict[str, Limiter]):
+        self.server = server
+        self.tools = tools
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        # The tool slot first: calls queued behind a busy tool must not sit on
+        # server slots that other tools could use
+        limiters = [limiter for limiter in (self.tools.get(context.message.name), self.server) if limiter]
+        if not limiters:
+            return await call_next(context)
+        async with AsyncExitStack() as stack:
+            try:
+                for limiter in limiters:
+                    await stack.enter_async_context(limiter.slot())
+            except Overloaded as e:
+                # INFO, not WARNING: under overload this fires per call; the shed counter is the signal
+                logger.info("Shed %s: %s (retry after %gs)", context.message.name, e, e.retry_after)
+                return overloaded_result(e)
+            return await call_next(context)
+
+
+def parse_limits(spec: str) -> dict[str, int]:
+    """Parse "get-forecast=8,power=4" into {"get-forecast": 8, "power": 4}."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.rpartition("=")
+        try:
+            limits[name.strip()] = int(value)
+        except ValueError:
+            logger.warning("Ignoring invalid tool concurrency limit: %r", item)
+    return limits
+
+
+def admission_control(
+    app,
+    max_concurrency: int | None = None,
+    tool_limits: dict[str, int] | None = None,
+    max_queue: int | None = None,
+    queue_timeout: float | None = None,
+) -> AdmissionMiddleware | None:
+    """Attach admission control to an app; arguments are defaults the environment can override."""
+    if max_concurrency is None or "MCP_MAX_CONCURRENCY" in os.environ:
+        max_concurrency = int(os.environ.get("MCP_MAX_CONCURRENCY", "64"))
+    if max_queue is None or "MCP_MAX_QUEUE" in os.environ:
+        max_queue = int(os.environ.get("MCP_MAX_QUEUE", "128"))
+    if queue_timeout is None or "MCP_QUEUE_TIMEOUT_MS" in os.environ:
+        queue_timeout = float(os.environ.get("MCP_QUEUE_TIMEOUT_MS", "5000")) / 1000
+    limits = {**(tool_limits or {}), **parse_limits(os.environ.get("MCP_TOOL_CONCURRENCY", ""))}
+
+    def limiter(scope: str, limit: int) -> Limiter:
+        return Limiter(app.name, scope, limit, max_queue, queue_timeout)
+
+    server = limiter("server", max_concurrency) if max_concurrency > 0 else None
+    tools = {tool: limiter(tool, limit) for tool, limit in limits.items() if limit > 0}
+    if server is None and not tools:
+        return None
+    middleware = AdmissionMiddleware(server, tools)
+    app.add_middleware(middleware)
+    return middleware
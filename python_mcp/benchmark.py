@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+End-to-End Benchmark
+
+Drives real MCP clients against the calculator and weather servers and
+reports throughput and p50/p95/p99 latency per tool and transport:
+
+- inproc: the FastMCP app in this process (in-memory transport);
+- stdio:  calculator_server.py / weather_server.py as subprocesses;
+- sse:    calculator_server_http.py / weather_server_http.py on ports 8000/8001;
+- http:   the same servers with MCP_TRANSPORT=streamable-http.
+
+The weather tools run against a local Open-Meteo / Nominatim stand-in, so
+results measure the servers rather than the public APIs.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --transports inproc stdio --iterations 500 --output results.json
+    python benchmark.py --compare baseline.json
+
+    # asyncio vs uvloop for small, chatty calculator calls over HTTP
+    python benchmark.py --transports sse http --servers calculator --loop asyncio --output asyncio.json
+    python benchmark.py --transports sse http --servers calculator --loop uvloop --compare asyncio.json
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Awaitable, Callable
+from urllib.parse import parse_qs, urlsplit
+
+from fastmcp import Client
+from fastmcp.client.transports import PythonStdioTransport
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+TRANSPORTS = ("inproc", "stdio", "sse", "http")
+
+SERVERS = {
+    "calculator": {"module": "calculator_server", "http_script": "calculator_server_http.py", "port": 8000},
+    "weather": {"module": "weather_server", "http_script": "weather_server_http.py", "port": 8001},
+}
+
+
+# ============================================================================
+# UPSTREAM STAND-IN
+# ============================================================================
+
+class _UpstreamHandler(BaseHTTPRequestHandler):
+    """Minimal Open-Meteo (/v1/forecast) and Nominatim (/search) responses."""
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/v1/forecast":
+            days = int(query.get("forecast_days", ["1"])[0])
+            start = date(2024, 1, 1)
+            body: Any = {
+                "current": {
+                    "temperature_2m": 12.3,
+                    "relative_humidity_2m": 71,
+                    "apparent_temperature": 10.8,
+                    "precipitation": 0.0,
+                    "weather_code": 2,
+                    "wind_speed_10m": 14.2,
+                    "wind_direction_10m": 240,
+                },
+                "daily": {
+                    "time": [(start + timedelta(days=i)).isoformat() for i in range(days)],
+                    "temperature_2m_max": [14.0 + i % 5 for i in range(days)],
+                    "temperature_2m_min": [6.0 + i % 3 for i in range(days)],
+                    "precipitation_sum": [0.4 * (i % 4) for i in range(days)],
+                    "weather_code": [(0, 2, 3, 61)[i % 4] for i in range(days)],
+                    "wind_speed_10m_max": [20.0 + i for i in range(days)],
+                },
+            }
+        elif url.path == "/search":
+            name = query.get("q", ["Somewhere"])[0]
+            body = [{"place_id": 1, "lat": "51.5074", "lon": "-0.1278", "display_name": name}]
+        else:
+            self.send_error(404)
+            return
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class UpstreamStandIn:
+    """Local HTTP server standing in for the weather server's upstream APIs."""
+
+    def __init__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _UpstreamHandler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, name="upstream", daemon=True)
+
+    @property
+    def env(self) -> dict[str, str]:
+        # The stand-in has no usage policy: geocoding is not paced
+        return {"OPEN_METEO_URL": f"{self.url}/v1/forecast", "NOMINATIM_URL": self.url, "MCP_NOMINATIM_RATE": "0"}
+
+    def __enter__(self) -> "UpstreamStandIn":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# ============================================================================
+# SCENARIOS
+# ============================================================================
+
+async def _prompt_flow(client: Client) -> Any:
+    """What an orchestrating model does: follow the redirect, fetch the prompt, call each step."""
+    await client.call_tool("hr_add_numbers", {"a": 5, "b": 3})
+    await client.get_prompt("hr_add_number_prompt", {"a": 5, "b": 3})
+    await client.call_tool("power", {"base": 5, "exponent": 3})
+    return await client.call_tool("add", {"a": 5, "b": 3})
+
+
+Scenario = Callable[[Client], Awaitable[Any]]
+
+SCENARIOS: dict[str, dict[str, Scenario]] = {
+    "calculator": {
+        "add": lambda c: c.call_tool("add", {"a": 5, "b": 3}),
+        "calculate": lambda c: c.call_tool("calculate", {"expression": "2 ^ 10"}),
+        "hr_add_numbers_fast": lambda c: c.call_tool("hr_add_numbers_fast", {"a": 5, "b": 3}),
+        "prompt_flow": _prompt_flow,
+    },
+    "weather": {
+        "get-current-weather": lambda c: c.call_tool("get-current-weather", {"location": "London"}),
+        "get-current-weather (coordinates)": lambda c: c.call_tool(
+            "get-current-weather", {"location": "51.5074,-0.1278"}
+        ),
+        "get-forecast": lambda c: c.call_tool("get-forecast", {"location": "London", "days": 7}),
+    },
+}
+
+
+def _failed(result: Any) -> bool:
+    if getattr(result, "is_error", False):
+        return True
+    content = getattr(result, "content", None) or []
+    text = getattr(content[0], "text", "") if content else ""
+    return isinstance(text, str) and text.startswith("Error")
+
+
+# ============================================================================
+# TRANSPORTS
+# ============================================================================
+
+def _wait_for_port(port: int, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode} before listening on {port}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server did not listen on port {port} within {timeout:.0f}s")
+
+
+class ServerUnderTest:
+    """Starts one server on one transport and yields a connected client."""
+
+    def __init__(self, server: str, transport: str, env: dict[str, str]):
+        self.server = server
+        self.transport = transport
+        self.env = {**os.environ, **env}
+        self._process: subprocess.Popen | None = None
+
+    async def __aenter__(self) -> Client:
+        spec = SERVERS[self.server]
+        if self.transport == "inproc":
+            os.environ.update(self.env)
+            sys.path.insert(0, HERE)
+            module = __import__(spec["module"])
+            self._client = Client(module.app)
+        elif self.transport == "stdio":
+            self._client = Client(PythonStdioTransport(
+                os.path.join(HERE, f"{spec['module']}.py"), env=self.env, cwd=HERE,
+                log_file=open(os.devnull, "w"),
+            ))
+        elif self.transport in ("sse", "http"):
+            mode = "sse" if self.transport == "sse" else "streamable-http"
+            self._process = subprocess.Popen(
+                [sys.executable, spec["http_script"]], cwd=HERE, env={**self.env, "MCP_TRANSPORT": mode},
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            await asyncio.to_thread(_wait_for_port, spec["port"], self._process)
+            path = "/sse" if self.transport == "sse" else "/mcp"
+            self._client = Client(f"http://127.0.0.1:{spec['port']}{path}")
+        else:
+            raise ValueError(f"Unknown transport '{self.transport}'")
+        return await self._client.__aenter__()
+
+    async def __aexit__(self, *exc) -> None:
+        try:
+            await self._client.__aexit__(*exc)
+        finally:
+            if self._process is not None:
+                self._process.terminate()
+                try:
+                    await asyncio.to_thread(self._process.wait, 10)
+                except subprocess.TimeoutExpired:
+                    self._process.kill()
+
+
+# ============================================================================
+# MEASUREMENT
+# ============================================================================
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def measure(client: Client, scenario: Scenario, iterations: int, warmup: int, concurrency: int) -> dict[str, Any]:
+    for _ in range(warmup):
+        await scenario(client)
+
+    latencies: list[float] = []
+    errors = 0
+    remaining = iterations
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                failed = _failed(await scenario(client))
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "throughput_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+    }
+
+
+async def run_benchmark(
+    transports: list[str],
+    servers: list[str],
+    iterations: int,
+    warmup: int,
+    concurrency: int,
+    loop: str = "asyncio",
+) -> list[dict[str, Any]]:
+    results = []
+    with UpstreamStandIn() as upstream:
+        # Keep server-side logging out of the measurement, and measure the
+        # server rather than the per-client rate limit or the forecast cache
+        env = {
+            **upstream.env,
+            "MCP_LOG_LEVEL": "WARNING",
+            "MCP_RATE_LIMIT": "0",
+            "MCP_WEATHER_CACHE_TTL": "0",
+            "MCP_LOOP": loop,
+        }
+        for transport in transports:
+            for server in servers:
+                async with ServerUnderTest(server, transport, env) as client:
+                    for tool, scenario in SCENARIOS[server].items():
+                        stats = await measure(client, scenario, iterations, warmup, concurrency)
+                        results.append({"transport": transport, "server": server, "tool": tool, **stats})
+                        print(
+                            f"{transport:<7} {tool:<36} {stats['throughput_per_s']:>9.1f}/s "
+                            f"p50 {stats['p50_ms']:>8.2f}ms  p95 {stats['p95_ms']:>8.2f}ms  "
+                            f"p99 {stats['p99_ms']:>8.2f}ms  errors {stats['errors']}",
+                            flush=True,
+                        )
+    return results
+
+
+# ============================================================================
+# REPORTING
+# ============================================================================
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any]) -> None:
+    """Print p50/p99/throughput changes against a previous results file."""
+    key = lambda r: (r["transport"], r["server"], r["tool"])
+    before = {key(r): r for r in baseline["results"]}
+    print(
+        f"\nCompared with {baseline.get('commit') or 'baseline'} "
+        f"({baseline.get('loop', 'asyncio')} loop, now {current.get('loop', 'asyncio')}):"
+    )
+    for row in current["results"]:
+        old = before.get(key(row))
+        if old is None:
+            continue
+        deltas = []
+        for field in ("p50_ms", "p99_ms", "throughput_per_s"):
+            change = (row[field] - old[field]) / old[field] * 100 if old[field] else 0.0
+            deltas.append(f"{field} {change:+6.1f}%")
+        print(f"{row['transport']:<7} {row['tool']:<36} " + "  ".join(deltas))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the MCP servers end to end.")
+    parser.add_argument("--transports", nargs="+", choices=TRANSPORTS, default=list(TRANSPORTS))
+    parser.add_argument("--servers", nargs="+", choices=sorted(SERVERS), default=sorted(SERVERS))
+    parser.add_argument("--iterations", type=int, default=200, help="measured calls per tool (default 200)")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured calls per tool (default 20)")
+    parser.add_argument("--concurrency", type=int, default=1, help="concurrent calls per client (default 1)")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    parser.add_argument(
+        "--loop", choices=("asyncio", "uvloop"), default="asyncio",
+        help="event loop of the HTTP servers (sse, http) under test (default asyncio)",
+    )
+    args = parser.parse_args()
+    if args.iterations < 1:
+        parser.error("--iterations must be at least 1")
+    if args.loop == "uvloop" and importlib.util.find_spec("uvloop") is None:
+        parser.error("--loop uvloop needs uvloop installed (pip install uvloop)")
+
+    logging.basicConfig(level=logging.WARNING)
+    results = asyncio.run(run_benchmark(
+        args.transports, args.servers, args.iterations, args.warmup, max(1, args.concurrency), args.loop
+    ))
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "iterations": args.iterations,
+        "concurrency": args.concurrency,
+        "loop": args.loop,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
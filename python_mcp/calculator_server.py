@@ -4,21 +4,108 @@ Calculator MCP Server
 
 An MCP server that provides calculator functionality for basic and advanced mathematical operations.
 Refactored to use FastMCP for cleaner, more maintainable code.
+
+Serves stdio by default; HTTP, or stdio and HTTP at once, with flags:
+    python calculator_server.py --transport sse --port 8000
+    python calculator_server.py --transport stdio,streamable-http
+(python calculator_server.py --help lists them; see server_cli.py and http_serving.py)
 """
 
+import asyncio
+import json
 import logging
 import math
+import os
 from typing import Any
 
-from fastmcp import FastMCP
+from fastmcp import Context, FastMCP
+
+import linalg_tools
+from log_setup import configure_logging, get_trace_logger
+from metrics import instrument
+from loop_watchdog import watch_loop
+from admission import admission_control
+from deadlines import propagate_cancellation
+from profiling import enable_profiling
+from progress import Progress
+from rate_limit import client_key, rate_limit
+from server_cli import apply_command_line, run_server
+from tracing import setup_tracing
+import payroll
+from employee_store import EmployeeStore
+from payroll import PayrollRuns
+from compute_pool import (
+    ComputePool,
+    estimate_factorial_cost,
+    estimate_power_cost,
+    exact_factorial,
+    exact_power,
+)
+from streaming_stats import DEFAULT_PERCENTILES, UploadSessions, resolve_data_path, summarize_file
+
+# Run as a script: command-line flags and --config files become the environment
+# settings read below (see server_cli.py)
+if __name__ == "__main__":
+    apply_command_line()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging (queued, lazily formatted, per-tool sampling; see log_setup.py)
+configure_logging()
 logger = logging.getLogger("calculator-server")
+trace = get_trace_logger("calculator-server")
 
 # Initialize FastMCP server
 app = FastMCP("calculator-server")
 
+# Per-tool call counts, latency histograms and GET /metrics
+instrument(app)
+
+# Spans per tool call and step, exported when MCP_TRACE_EXPORT is set
+tracer = setup_tracing(app, "calculator-server")
+
+# Event-loop lag metric, plus a logged stack whenever a tool blocks the loop
+watch_loop(app)
+
+# Cancel calls at their client's deadline (_meta.timeout_ms / deadline) or when the client goes away
+propagate_cancellation(app)
+
+# Per-client token buckets for HTTP clients (API key or session), charged per tool; runs
+# before admission control so a throttled client never takes a queue slot
+rate_limit(app, costs={"run_payroll": 20, "statistics": 5})
+
+# Concurrency limits with a bounded wait queue; excess calls get "overloaded, retry after"
+admission_control(app, tool_limits={"run_payroll": 2})
+
+# Admin-only /admin/profile/* routes, registered only when MCP_ADMIN_TOKEN is set
+enable_profiling(app)
+
+# Expensive evaluations run in worker processes so they cannot stall the loop
+compute_pool = ComputePool(
+    max_workers=int(os.environ.get("MCP_COMPUTE_WORKERS", "2")), timeout=10.0, cpu_seconds=5.0
+)
+
+# Running aggregates for chunked `statistics` uploads
+stats_uploads = UploadSessions(max_sessions=64, idle_timeout=600.0)
+
+# Inline arrays longer than this are aggregated off the event loop
+STATS_INLINE_LIMIT = 5000
+
+# `statistics` reads file_path only inside this directory; unset, only stdio clients may use it
+STATS_DATA_DIR = os.environ.get("MCP_STATS_DATA_DIR") or None
+
+# Employee directory, loaded from CSV into an indexed SQLite store
+EMPLOYEE_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "employees.csv")
+employee_store = EmployeeStore.from_csv(EMPLOYEE_CSV, pool_size=4)
+
+# Upper bounds for batch lookups and list pages
+MAX_BATCH_IDS = 1000
+MAX_PAGE_SIZE = 200
+
+# Batch lookups run (and stream their partial results) this many IDs at a time
+BATCH_CHUNK_SIZE = 20
+
+# Completed payroll runs, read back page by page
+payroll_runs = PayrollRuns(max_runs=8)
+
 
 # ============================================================================
 # CORE CALCULATION FUNCTIONS (Internal use)
@@ -31,7 +118,68 @@ async def _add_internal(a: float, b: float) -> float:
 
 async def _power_internal(base: float, exponent: float) -> float:
     """Internal power function. Returns raw number."""
-    return math.pow(base, exponent)
+    cost = estimate_power_cost(base, exponent)
+    return await compute_pool.run(math.pow, base, exponent, cost=cost)
+
+
+async def _exact_power_internal(base: int, exponent: int) -> str:
+    """Internal exact integer power. Returns the (possibly summarised) digits."""
+    cost = estimate_power_cost(base, exponent, exact=True, max_bits=compute_pool.max_result_bits)
+    return await compute_pool.run(exact_power, base, exponent, cost=cost)
+
+
+async def _factorial_internal(n: int) -> str:
+    """Internal factorial function. Returns the (possibly summarised) digits."""
+    cost = estimate_factorial_cost(n, max_bits=compute_pool.max_result_bits)
+    return await compute_pool.run(exact_factorial, n, cost=cost)
+
+
+async def _matrix_internal(fn, *args) -> dict:
+    """Run a matrix operation, moving large ones to a thread (BLAS releases the GIL)."""
+    linalg_tools.require_numpy()
+    matrices = [arg for arg in args if isinstance(arg, (list, dict))]
+    if linalg_tools.element_count(*matrices) <= linalg_tools.INLINE_ELEMENTS:
+        return fn(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, fn, *args)
+
+
+async def _payroll_internal(
+    department: str | None, partitions: int, progress: Progress | None = None
+) -> tuple[dict, dict]:
+    """Load compensation columns and compute every payslip in vectorised passes."""
+    payroll.require_numpy()
+    progress = progress or Progress(None)
+    loop = asyncio.get_running_loop()
+    columns = await loop.run_in_executor(None, employee_store.columns, department)
+    if not columns["employee_id"]:
+        raise ValueError(f"No employees found{f' in {department}' if department else ''}")
+
+    parts = payroll.partition(payroll.to_arrays(columns), partitions)
+    progress.total = len(parts)
+
+    async def report(index: int, result: dict) -> None:
+        # Partial result: the partition's totals, as soon as it is computed
+        partial = {"partition": index + 1, "partitions": len(parts), "payslips": len(result["net"]), **payroll.totals(result)}
+        await progress.advance(json.dumps(partial))
+
+    if len(parts) == 1:
+        # NumPy releases the GIL for the heavy passes, so a thread is enough
+        payslips = await loop.run_in_executor(None, payroll.compute_payslips, *parts[0])
+        await report(0, payslips)
+    else:
+        async def compute(index: int, part) -> dict:
+            result = await compute_pool.run(
+                payroll.compute_payslips, *part,
+                cost=len(part[0]) * len(payroll.TAX_BRACKETS),
+            )
+            # Partitions report as they finish, in whatever order that is
+            await report(index, result)
+            return result
+
+        results = await asyncio.gather(*(compute(index, part) for index, part in enumerate(parts)))
+        payslips = payroll.combine(results)
+    return columns, payslips
 
 
 # ============================================================================
@@ -48,11 +196,11 @@ async def add(
 ) -> float:
     """Add two numbers. Returns raw number for AI to use in calculations."""
     try:
-        logger.info(f"Tool called: add (AI orchestration) - a={a}, b={b}")
+        logger.info("Tool called: add (AI orchestration) - a=%s, b=%s", a, b, extra={"tool": "add"})
         result = await _add_internal(a, b)
         return result
     except Exception as e:
-        logger.error(f"Addition error: {e}", exc_info=True)
+        logger.error("Addition error: %s", e, exc_info=True)
         raise
 
 
@@ -69,7 +217,7 @@ async def subtract(
         result = a - b
         return f"{a} - {b} = {result}"
     except Exception as e:
-        logger.error(f"Subtraction error: {e}", exc_info=True)
+        logger.error("Subtraction error: %s", e, exc_info=True)
         return f"Error: {str(e)}"
 
 
@@ -86,7 +234,7 @@ async def multiply(
         result = a * b
         return f"{a} × {b} = {result}"
     except Exception as e:
-        logger.error(f"Multiplication error: {e}", exc_info=True)
+        logger.error("Multiplication error: %s", e, exc_info=True)
         return f"Error: {str(e)}"
 
 
@@ -105,7 +253,7 @@ async def divide(
         result = a / b
         return f"{a} ÷ {b} = {result}"
     except Exception as e:
-        logger.error(f"Division error: {e}", exc_info=True)
+        logger.error("Division error: %s", e, exc_info=True)
         return f"Error: {str(e)}"
 
 
@@ -119,11 +267,11 @@ async def power(
 ) -> float:
     """Calculate base raised to the power of exponent. Returns raw number."""
     try:
-        logger.info(f"Tool called: power (AI orchestration) - base={base}, exponent={exponent}")
+        logger.info("Tool called: power (AI orchestration) - base=%s, exponent=%s", base, exponent, extra={"tool": "power"})
         result = await _power_internal(base, exponent)
         return result
     except Exception as e:
-        logger.error(f"Power calculation error: {e}", exc_info=True)
+        logger.error("Power calculation error: %s", e, exc_info=True)
         raise
 
 
@@ -141,7 +289,25 @@ async def square_root(
         result = math.sqrt(number)
         return f"√{number} = {result}"
     except Exception as e:
-        logger.error(f"Square root error: {e}", exc_info=True)
+        logger.error("Square root error: %s", e, exc_info=True)
+        return f"Error: {str(e)}"
+
+
+@app.tool(
+    name="factorial",
+    description="Calculate the exact factorial of a non-negative integer (n!).",
+)
+async def factorial(
+    n: int = "Non-negative integer",
+) -> str:
+    """Calculate n! exactly. Very large results are summarised."""
+    try:
+        if n < 0:
+            return "Error: Factorial is only defined for non-negative integers"
+        result = await _factorial_internal(n)
+        return f"{n}! = {result}"
+    except Exception as e:
+        logger.error("Factorial error: %s", e, exc_info=True)
         return f"Error: {str(e)}"
 
 
@@ -197,28 +363,250 @@ async def calculate(
                 result = a / b
                 return f"{a} ÷ {b} = {result}"
         elif operator == '^':
-            result = math.pow(a, b)
+            try:
+                result = await _power_internal(a, b)
+            except OverflowError:
+                # Too big for a float: fall back to exact integer arithmetic
+                if not (a.is_integer() and b.is_integer() and b >= 0):
+                    raise
+                result = await _exact_power_internal(int(a), int(b))
             return f"{a} ^ {b} = {result}"
         
         return "Error: Unsupported operator"
         
     except Exception as e:
-        logger.error(f"Calculation error: {e}", exc_info=True)
+        logger.error("Calculation error: %s", e, exc_info=True)
         return f"Error: {str(e)}"
 
+@app.tool(
+    name="statistics",
+    description=(
+        "Compute count, sum, mean, variance, min/max and percentiles over many numbers in one pass. "
+        "Pass `values` inline, upload large inputs in chunks (pass the returned upload_id with "
+        "finalize=false until the last chunk), or give a `file_path` (text/CSV) in the server's data directory."
+    ),
+)
+async def statistics(
+    values: list[float] | None = None,
+    file_path: str | None = None,
+    upload_id: str | None = None,
+    finalize: bool = True,
+    percentiles: list[float] | None = None,
+) -> dict:
+    """Streaming, constant-memory statistics over inline, chunked or file input."""
+    try:
+        percentiles = percentiles or list(DEFAULT_PERCENTILES)
+        if any(p < 0 or p > 100 for p in percentiles):
+            return {"error": "Percentiles must be between 0 and 100"}
+        loop = asyncio.get_running_loop()
+
+        if file_path is not None:
+            logger.info("Tool called: statistics - file_path=%s", file_path, extra={"tool": "statistics"})
+            if STATS_DATA_DIR is not None:
+                file_path = resolve_data_path(file_path, STATS_DATA_DIR)
+            elif client_key() != "local":
+                # Without a data directory a remote client could read any file the server can
+                return {"error": "file_path is not available over HTTP on this server"}
+            return await loop.run_in_executor(None, summarize_file, file_path, percentiles)
+
+        if values is None and upload_id is None:
+            return {"error": "Provide values, an upload_id or a file_path"}
+
+        async with stats_uploads.session(upload_id) as (upload_id, summary):
+            if values:
+                if len(values) > STATS_INLINE_LIMIT:
+                    await loop.run_in_executor(None, summary.add_many, values)
+                else:
+                    summary.add_many(values)
+
+            if not finalize:
+                return {"upload_id": upload_id, "count": summary.count, "finalized": False}
+
+            stats_uploads.pop(upload_id)
+            return summary.result(percentiles)
+    except Exception as e:
+        logger.error("Statistics error: %s", e, exc_info=True)
+        return {"error": str(e)}
+
+
+# ============================================================================
+# MATRIX TOOLS
+# Matrices are JSON nested lists, or binary buffers for large inputs:
+# {"shape": [rows, cols], "dtype": "<f8", "data": "<base64 little-endian float64>"}
+# ============================================================================
+
+@app.tool(
+    name="matrix_multiply",
+    description="Multiply two matrices (a @ b). Matrices are nested lists or {shape, dtype: '<f8', data: base64} buffers; output_encoding is 'json' or 'base64'.",
+)
+async def matrix_multiply(
+    a: linalg_tools.MatrixSpec,
+    b: linalg_tools.MatrixSpec,
+    output_encoding: str = "json",
+) -> dict:
+    """Matrix product using NumPy/BLAS."""
+    try:
+        return await _matrix_internal(linalg_tools.matrix_multiply, a, b, output_encoding)
+    except Exception as e:
+        logger.error("Matrix multiply error: %s", e, exc_info=True)
+        return {"error": str(e)}
+
+
+@app.tool(
+    name="matrix_solve",
+    description="Solve the linear system a @ x = b for x. Matrices are nested lists or {shape, dtype: '<f8', data: base64} buffers.",
+)
+async def matrix_solve(
+    a: linalg_tools.MatrixSpec,
+    b: linalg_tools.MatrixSpec,
+    output_encoding: str = "json",
+) -> dict:
+    """Solve a square linear system."""
+    try:
+        return await _matrix_internal(linalg_tools.matrix_solve, a, b, output_encoding)
+    except Exception as e:
+        logger.error("Matrix solve error: %s", e, exc_info=True)
+        return {"error": str(e)}
+
+
+@app.tool(
+    name="matrix_determinant",
+    description="Calculate the determinant of a square matrix (also returns sign and log-magnitude).",
+)
+async def matrix_determinant(
+    a: linalg_tools.MatrixSpec,
+) -> dict:
+    """Determinant of a square matrix."""
+    try:
+        return await _matrix_internal(linalg_tools.matrix_determinant, a)
+    except Exception as e:
+        logger.error("Matrix determinant error: %s", e, exc_info=True)
+        return {"error": str(e)}
+
+
+@app.tool(
+    name="matrix_inverse",
+    description="Calculate the inverse of a square matrix. output_encoding is 'json' or 'base64'.",
+)
+async def matrix_inverse(
+    a: linalg_tools.MatrixSpec,
+    output_encoding: str = "json",
+) -> dict:
+    """Inverse of a square matrix."""
+    try:
+        return await _matrix_internal(linalg_tools.matrix_inverse, a, output_encoding)
+    except Exception as e:
+        logger.error("Matrix inverse error: %s", e, exc_info=True)
+        return {"error": str(e)}
+
+
 @app.tool(
     name="get_employee_details",
     description="to search employee details",
 )
-def get_employee_details(
+async def get_employee_details(
     employee_id: str = "Employee ID",
-) -> str:
-    return {
-        "employee_id": employee_id,
-        "name": "John Doe",
-        "department": "HR",
-        "salary": 100000,
-    }
+) -> dict:
+    """Look up a single employee by ID."""
+    try:
+        loop = asyncio.get_running_loop()
+        employee = await loop.run_in_executor(None, employee_store.get, employee_id)
+        if employee is None:
+            return {"error": f"Employee '{employee_id}' not found"}
+        return employee
+    except Exception as e:
+        logger.error("Employee lookup error: %s", e, exc_info=True)
+        return {"error": str(e)}
+
+
+@app.tool(
+    name="get_employees_batch",
+    description="Look up many employees at once by ID (e.g. a whole team) in a single query.",
+)
+async def get_employees_batch(
+    employee_ids: list[str],
+    ctx: Context | None = None,
+) -> dict:
+    """Batch employee lookup. Unknown IDs are listed under `not_found`; found ones stream as progress."""
+    try:
+        if len(employee_ids) > MAX_BATCH_IDS:
+            return {"error": f"At most {MAX_BATCH_IDS} employee IDs per call"}
+        unique_ids = list(dict.fromkeys(employee_ids))
+        chunks = [unique_ids[start:start + BATCH_CHUNK_SIZE] for start in range(0, len(unique_ids), BATCH_CHUNK_SIZE)]
+        progress = Progress(ctx, total=len(chunks))
+        loop = asyncio.get_running_loop()
+        result: dict[str, list] = {"employees": [], "not_found": []}
+        for chunk in chunks:
+            found = await loop.run_in_executor(None, employee_store.get_many, chunk)
+            result["employees"].extend(found["employees"])
+            result["not_found"].extend(found["not_found"])
+            # Partial result: this chunk's employees, ahead of the whole batch
+            await progress.advance(json.dumps(found["employees"]))
+        return result
+    except Exception as e:
+        logger.error("Employee batch lookup error: %s", e, exc_info=True)
+        return {"error": str(e)}
+
+
+@app.tool(
+    name="list_employees",
+    description="List employees ordered by ID, optionally filtered by department. Pass the returned next_cursor as cursor to get the next page.",
+)
+async def list_employees(
+    department: str | None = None,
+    cursor: str | None = None,
+    limit: int = 50,
+) -> dict:
+    """Keyset-paginated employee listing."""
+    try:
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, employee_store.list, department, cursor, limit)
+    except Exception as e:
+        logger.error("Employee listing error: %s", e, exc_info=True)
+        return {"error": str(e)}
+
+
+@app.tool(
+    name="run_payroll",
+    description="Run payroll for a period (e.g. '2024-05') over all employees or one department. Returns totals, the first page of payslips and a run_id/next_cursor for get_payroll_page. partitions > 1 splits very large populations across worker processes.",
+)
+async def run_payroll(
+    period: str = "Payroll period (e.g. '2024-05')",
+    department: str | None = None,
+    page_size: int = 100,
+    partitions: int = 1,
+    ctx: Context | None = None,
+) -> dict:
+    """Bulk payroll run: brackets, deductions and allowances applied to all employees at once."""
+    try:
+        logger.info("Tool called: run_payroll - period=%s, department=%s", period, department, extra={"tool": "run_payroll"})
+        columns, payslips = await _payroll_internal(department, partitions, Progress(ctx))
+        run = payroll_runs.add(period, columns, payslips)
+        page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+        return {**PayrollRuns.summary(run), **PayrollRuns.page(run, 0, page_size)}
+    except Exception as e:
+        logger.error("Payroll run error: %s", e, exc_info=True)
+        return {"error": str(e)}
+
+
+@app.tool(
+    name="get_payroll_page",
+    description="Get the next page of payslip summaries from a run_payroll result.",
+)
+async def get_payroll_page(
+    run_id: str = "run_id returned by run_payroll",
+    cursor: int = 0,
+    limit: int = 100,
+) -> dict:
+    """Page through the payslips of a completed payroll run."""
+    try:
+        run = payroll_runs.get(run_id)
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        return PayrollRuns.page(run, max(0, int(cursor)), limit)
+    except Exception as e:
+        logger.error("Payroll page error: %s", e, exc_info=True)
+        return {"error": str(e)}
 
 
 # ============================================================================
@@ -247,31 +635,35 @@ async def hr_add_numbers_fast(
     """
     try:
         # 🔔 PROMPT AUTO-TRIGGER: Execute the workflow from hr_add_number_prompt
-        logger.info(f"🔔 AUTO-TRIGGERING PROMPT: hr_add_number_prompt logic for a={a}, b={b}")
+        logger.info("🔔 AUTO-TRIGGERING PROMPT: hr_add_number_prompt logic for a=%s, b=%s", a, b, extra={"tool": "hr_add_numbers_fast"})
         
         # Step 1 from prompt: Calculate power (use internal function)
-        logger.info(f"  Step 1: Calling power({a}, {b})")
-        power_result = await _power_internal(a, b)
-        logger.info(f"  Step 1 result: {power_result}")
+        trace.debug("  Step 1: Calling power(%s, %s)", a, b)
+        with tracer.span("step1.power"):
+            power_result = await _power_internal(a, b)
+        trace.debug("  Step 1 result: %s", power_result)
         
         # Step 2 from prompt: Calculate addition (use internal function)
-        logger.info(f"  Step 2: Calling add({a}, {b})")
-        addition_result = await _add_internal(a, b)
-        logger.info(f"  Step 2 result: {addition_result}")
+        trace.debug("  Step 2: Calling add(%s, %s)", a, b)
+        with tracer.span("step2.add"):
+            addition_result = await _add_internal(a, b)
+        trace.debug("  Step 2 result: %s", addition_result)
         
         # Step 3 from prompt: Combine results
-        logger.info(f"  Step 3: Combining {power_result} + {addition_result}")
-        combined_total = power_result + addition_result
-        logger.info(f"  Step 3 result: {combined_total}")
+        trace.debug("  Step 3: Combining %s + %s", power_result, addition_result)
+        with tracer.span("step3.combine"):
+            combined_total = power_result + addition_result
+        trace.debug("  Step 3 result: %s", combined_total)
         
         # Step 4 from prompt: Format result
-        logger.info(f"  Step 4: Formatting result with emoji style")
-        result = f"⚡ Fast Mode (Prompt Auto-Executed): The power result is {power_result} ({a}^{b}), the addition result is {addition_result} ({a} + {b}), and the combined total is {combined_total}. 😊"
+        trace.debug("  Step 4: Formatting result with emoji style")
+        with tracer.span("step4.format"):
+            result = f"⚡ Fast Mode (Prompt Auto-Executed): The power result is {power_result} ({a}^{b}), the addition result is {addition_result} ({a} + {b}), and the combined total is {combined_total}. 😊"
         
-        logger.info(f"✅ PROMPT AUTO-TRIGGER COMPLETE")
+        trace.debug("✅ PROMPT AUTO-TRIGGER COMPLETE")
         return result
     except Exception as e:
-        logger.error(f"hr_add_numbers_fast error: {e}", exc_info=True)
+        logger.error("hr_add_numbers_fast error: %s", e, exc_info=True)
         return f"Error: {str(e)}"
 
 
@@ -296,7 +688,7 @@ async def hr_add_numbers(
     """
     try:
         # Direct AI to use the prompt instead of duplicating logic
-        logger.info(f"🔔 Directing AI to use hr_add_number_prompt - a={a}, b={b}")
+        logger.info("🔔 Directing AI to use hr_add_number_prompt - a=%s, b=%s", a, b, extra={"tool": "hr_add_numbers"})
         
         return {
             "mode": "use_prompt",
@@ -305,7 +697,7 @@ async def hr_add_numbers(
             "parameters": {"a": a, "b": b}
         }
     except Exception as e:
-        logger.error(f"hr_add_numbers error: {e}", exc_info=True)
+        logger.error("hr_add_numbers error: %s", e, exc_info=True)
         return {"error": str(e)}
 
 
@@ -316,12 +708,12 @@ async def hr_add_numbers(
 async def hr_add_number_prompt(
     a: float = "First number",
     b: float = "Second number",
-) -> list[dict]:
+) -> str:
     """
     AI ORCHESTRATES: Returns prompt instructions for AI to follow.
     The AI will call multiple tools step-by-step based on these instructions.
     """
-    logger.info(f"🔔 Prompt triggered: hr_add_number_prompt - a={a}, b={b}")
+    logger.info("🔔 Prompt triggered: hr_add_number_prompt - a=%s, b=%s", a, b)
     
     text = f"""You are given two numbers: {a} and {b}.
 
@@ -333,16 +725,10 @@ Step 5: Present the final result in words with emoji style.
 
 Example format: 'The power result is X ({a}^{b}), the addition result is Y ({a} + {b}), the combined total is Z, and the multiplied result is W. 😊'"""
     
-    return [{"role": "user", "content": text}]
+    # A plain string is rendered as a single user message
+    return text
 
 
 if __name__ == "__main__":
-    try:
-        logger.info("Starting Calculator MCP Server with FastMCP...")
-        app.run()
-    except KeyboardInterrupt:
-        logger.info("Server shutdown requested")
-    except Exception as e:
-        logger.error(f"Fatal error: {e}", exc_info=True)
-        raise
+    run_server(app, default_port=8000, shutdown=compute_pool.shutdown)
 
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Compute Pool
+
+Keeps CPU-heavy calculations off the asyncio event loop.
+Every evaluation is given an estimated cost: cheap ones run inline, expensive
+ones are sent to a bounded process pool with a wall-clock timeout and a
+per-call CPU-time limit, so one pathological request cannot freeze the server.
+
+A big-integer `pow` or `math.factorial` is a single C call that no Python
+signal handler can interrupt, so both limits stop the worker process itself:
+the kernel kills a worker that passes its CPU limit (SIGXCPU keeps its default
+action), and the pool kills one still running at the wall-clock timeout.
+Each worker is its own single-process executor, so replacing it never
+disturbs calls running in the others. Results are capped in size to what
+fits comfortably in the CPU budget.
+
+Workers are spawned without re-importing the parent's main script: run as
+`python calculator_server.py`, a spawned worker would otherwise build the
+whole server (app, employee store, middleware, logging) again before its
+first calculation. Everything a worker runs lives in importable modules.
+"""
+
+import asyncio
+import decimal
+import logging
+import math
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing.context import SpawnContext, SpawnProcess
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+try:
+    import resource
+except ImportError:  # Windows has no RLIMIT_CPU
+    resource = None
+
+logger = logging.getLogger("compute-pool")
+
+# Rough cost units: one unit is about one machine-word operation.
+INLINE_COST_LIMIT = 50_000
+# Result bits allowed per second of CPU budget: the slowest case, a factorial of
+# 5M bits, takes about 1.2 s on a current core, leaving room for slower machines
+BITS_PER_CPU_SECOND = 1_000_000
+DEFAULT_CPU_SECONDS = 5.0
+MAX_RESULT_BITS = BITS_PER_CPU_SECOND * DEFAULT_CPU_SECONDS
+LOG2_10 = math.log2(10)
+
+
+class CalculationError(Exception):
+    """Base class for calculations rejected or aborted by the pool."""
+
+
+class CalculationTooExpensive(CalculationError):
+    """The estimated cost is beyond what the server is willing to compute."""
+
+
+class CalculationTimeout(CalculationError):
+    """The calculation exceeded its wall-clock or CPU-time budget."""
+
+
+# ============================================================================
+# COST ESTIMATORS
+# ============================================================================
+
+def estimate_power_cost(
+    base: float, exponent: float, exact: bool = False, max_bits: float = MAX_RESULT_BITS
+) -> float:
+    """Estimate the cost of base ** exponent. Float math is always O(1)."""
+    if not exact:
+        return 1.0
+    bits = abs(exponent) * math.log2(max(abs(base), 2))
+    if bits > max_bits:
+        raise CalculationTooExpensive(
+            f"Result of {base} ^ {exponent} would have about {int(bits)} bits"
+        )
+    # Repeated squaring on big integers is dominated by the last multiplication,
+    # which is roughly Karatsuba in the size of the result.
+    return bits ** 1.585 / 64
+
+
+def estimate_factorial_cost(n: int, max_bits: float = MAX_RESULT_BITS) -> float:
+    """Estimate the cost of n! from the bit length of the result."""
+    if n < 2:
+        return 1.0
+    bits = n * math.log2(n)
+    if bits > max_bits:
+        raise CalculationTooExpensive(f"{n}! would have about {int(bits)} bits")
+    return bits ** 1.585 / 64
+
+
+# ============================================================================
+# WORKER FUNCTIONS (must be importable so they can be pickled)
+# ============================================================================
+
+def describe_integer(value: int, edge_digits: int = 20) -> str:
+    """Render an integer, summarising it when it is too long to print in full."""
+    if value.bit_length() <= 4000 * LOG2_10:
+        return str(value)
+    sign = "-" if value < 0 else ""
+    value = abs(value)
+    # Full decimal conversion is quadratic, so derive the digit count and
+    # leading digits from log10 of the top bits instead.
+    shift = value.bit_length() - 256
+    with decimal.localcontext() as ctx:
+        ctx.prec = 60
+        log10 = decimal.Decimal(value >> shift).log10() + shift * decimal.Decimal(2).log10()
+        digits = int(log10) + 1
+        leading = int(decimal.Decimal(10) ** (log10 - int(log10) + edge_digits - 1))
+    trailing = value % 10 ** edge_digits
+    return f"{sign}{leading}...{trailing:0{edge_digits}d} ({digits} digits)"
+
+
+def exact_power(base: int, exponent: int) -> str:
+    """Exact integer exponentiation, rendered as text."""
+    return describe_integer(base ** exponent)
+
+
+def exact_factorial(n: int) -> str:
+    """Exact factorial, rendered as text."""
+    return describe_integer(math.factorial(n))
+
+
+def _worker_init() -> None:
+    if resource is not None:
+        # Passing the soft CPU limit kills the worker, even inside one long C call.
+        # (Lowering the hard limit would do the same, but can never be undone, so
+        # every call would need a freshly spawned worker.) No core files.
+        signal.signal(signal.SIGXCPU, signal.SIG_DFL)
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+def _run_limited(cpu_seconds: float, fn: Callable[..., Any], *args: Any) -> Any:
+    """Run fn in a worker with a soft RLIMIT_CPU armed for this call only."""
+    if resource is None:
+        return fn(*args)
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = usage.ru_utime + usage.ru_stime
+    limit = math.ceil(used + cpu_seconds)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+    try:
+        return fn(*args)
+    finally:
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+@contextmanager
+def _main_hidden():
+    """Hide the main script from multiprocessing, so a process spawned now skips importing it."""
+    main = sys.modules["__main__"]
+    saved = {name: main.__dict__[name] for name in ("__file__", "__spec__") if name in main.__dict__}
+    main.__dict__.pop("__file__", None)
+    main.__spec__ = None
+    try:
+        yield
+    finally:
+        main.__dict__.update(saved)
+
+
+class _WorkerProcess(SpawnProcess):
+    def start(self) -> None:
+        # The spawn preparation data (including the main script) is taken here
+        with _main_hidden():
+            super().start()
+
+
+class _WorkerContext(SpawnContext):
+    """Spawn context for one executor's workers: slim, and kept track of so they can be killed."""
+
+    def __init__(self):
+        super().__init__()
+        self.processes: list[_WorkerProcess] = []
+
+    def Process(self, *args: Any, **kwargs: Any) -> _WorkerProcess:
+        process = _WorkerProcess(*args, **kwargs)
+        self.processes = [p for p in self.processes if p.is_alive()] + [process]
+        return process
+
+
+def _kill(executor: ProcessPoolExecutor, context: _WorkerContext) -> None:
+    """Stop an executor's worker now, whatever it is running."""
+    # The executor offers no way to stop a running call, so kill the processes it started
+    for process in context.processes:
+        if process.is_alive():
+            process.kill()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ============================================================================
+# POOL
+# ============================================================================
+
+class ComputePool:
+    """Routes calculations inline or to a bounded process pool by estimated cost."""
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        timeout: float = 10.0,
+        cpu_seconds: float = DEFAULT_CPU_SECONDS,
+        inline_cost: float = INLINE_COST_LIMIT,
+    ):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.inline_cost = inline_cost
+        # One single-process executor per worker, started on first use
+        self._executors: list[ProcessPoolExecutor | None] = [None] * max_workers
+        self._contexts: list[_WorkerContext | None] = [None] * max_workers
+        self._idle: asyncio.Queue | None = None
+
+    @property
+    def max_result_bits(self) -> float:
+        """The largest result the CPU budget allows; pass it to the estimators."""
+        return BITS_PER_CPU_SECOND * self.cpu_seconds
+
+    @property
+    def started(self) -> bool:
+        return any(executor is not None for executor in self._executors)
+
+    def _get_executor(self, slot: int) -> ProcessPoolExecutor:
+        if self._executors[slot] is None:
+            self._contexts[slot] = _WorkerContext()
+            self._executors[slot] = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=self._contexts[slot],
+                initializer=_worker_init,
+            )
+        return self._executors[slot]
+
+    def _replace(self, slot: int) -> None:
+        executor, self._executors[slot] = self._executors[slot], None
+        if executor is not None:
+            _kill(executor, self._contexts[slot])
+
+    async def run(self, fn: Callable[..., Any], *args: Any, cost: float) -> Any:
+        """Run fn(*args) inline if cheap, otherwise in the process pool."""
+        if cost <= self.inline_cost:
+            return fn(*args)
+
+        # Waiting for a worker counts against the timeout, so a backlog of heavy
+        # calls cannot hold a caller indefinitely.
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for slot in range(self.max_workers):
+                self._idle.put_nowait(slot)
+        try:
+            return await asyncio.wait_for(self._submit(fn, *args), self.timeout)
+        except asyncio.TimeoutError:
+            raise CalculationTimeout(
+                f"Calculation did not finish within {self.timeout}s"
+            ) from None
+
+    async def _submit(self, fn: Callable[..., Any], *args: Any) -> Any:
+        slot = await self._idle.get()
+        try:
+            logger.debug("Offloading %s%r to worker %d", fn.__name__, args, slot)
+            future = self._get_executor(slot).submit(
+                _run_limited, self.cpu_seconds, fn, *args
+            )
+            try:
+                return await asyncio.wrap_future(future)
+            except BrokenProcessPool:
+                # Killed by the kernel at its CPU limit (or crashed): start afresh
+                logger.warning("Worker %d stopped running %s; replacing it", slot, fn.__name__)
+                self._replace(slot)
+                raise CalculationTimeout(
+                    f"Calculation exceeded its CPU time limit of {self.cpu_seconds}s"
+                ) from None
+            except asyncio.CancelledError:
+                # Timed out or abandoned: a running call would hold the worker to
+                # its CPU limit, so stop it now
+                if not future.cancel():
+                    logger.warning("Stopping worker %d still running %s", slot, fn.__name__)
+                    self._replace(slot)
+                raise
+        finally:
+            self._idle.put_nowait(slot)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, cancelling anything still queued."""
+        for executor in self._executors:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self._executors = [None] * self.max_workers
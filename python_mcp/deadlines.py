@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Deadlines and Cancellation
+
+Stops work whose result can no longer be delivered:
+
+- Client deadlines: a request may carry `_meta.timeout_ms` (relative, so no
+  clock agreement is needed) or `_meta.deadline` (absolute, Unix seconds).
+  A call that arrives past its deadline is rejected without running, and a
+  call still running at its deadline is cancelled.
+- Dropped clients: on streamable HTTP the tool call runs while its POST is
+  open; if the client cancels or goes away, the POST disconnects and the call
+  is cancelled. (SSE sessions already cancel their calls when the client
+  sends notifications/cancelled or the stream drops.)
+
+Cancellation reaches everything the call awaits: outbound httpx requests are
+aborted, queued executor jobs (geocoding) are dropped before they start, and
+admission or upstream slots are given back. Code that talks to an upstream
+uses timeout_for() so no single request outlives the caller's deadline.
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from typing import Any
+
+from fastmcp.server.dependencies import get_http_request
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from fastmcp.tools import ToolResult
+
+from metrics import REGISTRY
+from tracing import request_meta
+
+logger = logging.getLogger("deadlines")
+
+REGISTRY.describe("tool_cancellations_total", "Tool calls stopped early, by reason.")
+
+# Absolute deadline (time.monotonic()) of the tool call running in this context
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("mcp_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before an upstream call could be made."""
+
+
+def time_left() -> float | None:
+    """Seconds until the current call's deadline, or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def timeout_for(default: float) -> float:
+    """`default`, shortened to the time left before the current call's deadline."""
+    left = time_left()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("request deadline exceeded")
+    return min(default, left)
+
+
+def parse_deadline(meta: dict[str, Any]) -> float | None:
+    """The request's deadline on the monotonic clock, from `_meta`."""
+    deadlines = []
+    try:
+        if meta.get("timeout_ms") is not None:
+            deadlines.append(time.monotonic() + float(meta["timeout_ms"]) / 1000)
+        if meta.get("deadline") is not None:
+            deadlines.append(time.monotonic() + float(meta["deadline"]) - time.time())
+    except (TypeError, ValueError):
+        logger.warning("Ignoring invalid deadline in request _meta: %r", meta)
+    return min(deadlines) if deadlines else None
+
+
+def _open_request():
+    """The HTTP request whose connection the call's result goes back on, if any."""
+    try:
+        request = get_http_request()
+    except RuntimeError:
+        return None
+    # SSE answers each POST with 202 at once and replies on the stream, so
+    # the POST's own disconnect means nothing
+    if "session_id" in request.query_params:
+        return None
+    return request
+
+
+async def _disconnected(request) -> None:
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+def stopped_result(tool: str, reason: str) -> ToolResult:
+    text = "deadline exceeded" if reason == "deadline_exceeded" else "client disconnected"
+    return ToolResult(
+        content=f"Error: {tool} stopped, {text}",
+        structured_content={"error": reason, "tool": tool},
+        is_error=True,
+    )
+
+
+class DeadlineMiddleware(Middleware):
+    """Cancels a tool call at its client deadline or when its client goes away."""
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        tool = context.message.name
+        deadline = parse_deadline(request_meta(context))
+        request = _open_request()
+        if deadline is None and request is None:
+            return await call_next(context)
+        if deadline is not None and deadline <= time.monotonic():
+            REGISTRY.inc("tool_cancellations_total", tool=tool, reason="deadline_exceeded")
+            return stopped_result(tool, "deadline_exceeded")
+
+        # The call runs in its own task (which inherits the deadline) so it can
+        # be cancelled without cancelling the request handler around it
+        token = _deadline.set(deadline)
+        try:
+            call = asyncio.ensure_future(call_next(context))
+        finally:
+            _deadline.reset(token)
+        watcher = asyncio.ensure_future(_disconnected(request)) if request is not None else None
+        try:
+            timeout = None if deadline is None else deadline - time.monotonic()
+            waiting = {call} if watcher is None else {call, watcher}
+            await asyncio.wait(waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if call.done():
+                return call.result()
+            reason = "client_disconnected" if watcher is not None and watcher.done() else "deadline_exceeded"
+            call.cancel()
+            # Wait for the call to unwind, so its slots are back before we return
+            await asyncio.wait({call})
+            REGISTRY.inc("tool_cancellations_total", tool=tool, reason=reason)
+            logger.info("Cancelled %s: %s", tool, reason.replace("_", " "), extra={"tool": tool})
+            return stopped_result(tool, reason)
+        finally:
+            call.cancel()
+            if watcher is not None:
+                watcher.cancel()
+
+
+def propagate_cancellation(app) -> DeadlineMiddleware:
+    """Attach deadline and disconnect handling to an app."""
+    middleware = DeadlineMiddleware()
+    app.add_middleware(middleware)
+    return middleware
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Employee Store
+
+SQLite-backed employee directory for the HR tools, loaded from CSV.
+Lookups use the primary-key and department indexes, batch lookups resolve
+many IDs with a single `IN (...)` query, and listings page with a keyset
+cursor (the last employee_id seen) instead of OFFSET.
+"""
+
+import csv
+import logging
+import queue
+import sqlite3
+import uuid
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+logger = logging.getLogger("employee-store")
+
+# SQLite's default limit on bound parameters is 999 on older builds
+MAX_PARAMS_PER_QUERY = 500
+
+COLUMNS = ("employee_id", "name", "department", "salary", "allowances", "deductions")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS employees (
+    employee_id TEXT PRIMARY KEY,
+    name        TEXT NOT NULL,
+    department  TEXT NOT NULL,
+    salary      REAL NOT NULL,
+    allowances  REAL NOT NULL DEFAULT 0,
+    deductions  REAL NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_employees_department
+    ON employees (department, employee_id);
+"""
+
+SELECT_COLUMNS = f"SELECT {', '.join(COLUMNS)} FROM employees"
+
+
+class EmployeeStore:
+    """Employee lookups over a small pool of SQLite connections."""
+
+    def __init__(self, database: str | None = None, pool_size: int = 4):
+        # Without a path, use a named shared-cache in-memory database so that
+        # every pooled connection sees the same data.
+        if database is None:
+            database = f"file:employees-{uuid.uuid4().hex}?mode=memory&cache=shared"
+        self.database = database
+        self._pool: queue.Queue[sqlite3.Connection] = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        # Keeps an in-memory database alive for the lifetime of the store
+        self._anchor = self._connect()
+        self._anchor.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.database,
+            uri=self.database.startswith("file:"),
+            check_same_thread=False,
+            cached_statements=64,  # keeps our prepared statements compiled
+        )
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @classmethod
+    def from_csv(cls, csv_path: str, database: str | None = None, pool_size: int = 4) -> "EmployeeStore":
+        store = cls(database, pool_size)
+        store.load_csv(csv_path)
+        return store
+
+    def load_csv(self, csv_path: str) -> int:
+        """Insert or replace every row of the CSV. Returns the number of rows loaded."""
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            rows = [
+                (
+                    row["employee_id"],
+                    row["name"],
+                    row["department"],
+                    float(row["salary"]),
+                    float(row.get("allowances") or 0),
+                    float(row.get("deductions") or 0),
+                )
+                for row in csv.DictReader(f)
+            ]
+        with self._connection() as conn, conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO employees ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                rows,
+            )
+        logger.info("Loaded %d employees from %s", len(rows), csv_path)
+        return len(rows)
+
+    def get(self, employee_id: str) -> dict[str, Any] | None:
+        with self._connection() as conn:
+            row = conn.execute(f"{SELECT_COLUMNS} WHERE employee_id = ?", (employee_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_many(self, employee_ids: list[str]) -> dict[str, Any]:
+        """Resolve many IDs with indexed IN queries, preserving the requested order."""
+        unique_ids = list(dict.fromkeys(employee_ids))
+        found: dict[str, dict[str, Any]] = {}
+        with self._connection() as conn:
+            for start in range(0, len(unique_ids), MAX_PARAMS_PER_QUERY):
+                chunk = unique_ids[start:start + MAX_PARAMS_PER_QUERY]
+                placeholders = ",".join("?" * len(chunk))
+                for row in conn.execute(f"{SELECT_COLUMNS} WHERE employee_id IN ({placeholders})", chunk):
+                    found[row["employee_id"]] = dict(row)
+        return {
+            "employees": [found[i] for i in unique_ids if i in found],
+            "not_found": [i for i in unique_ids if i not in found],
+        }
+
+    def list(self, department: str | None = None, after: str | None = None, limit: int = 50) -> dict[str, Any]:
+        """One page of employees ordered by ID. Pass `next_cursor` back as `after`."""
+        clauses, params = [], []
+        if department is not None:
+            clauses.append("department = ?")
+            params.append(department)
+        if after is not None:
+            clauses.append("employee_id > ?")
+            params.append(after)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        # Fetch one extra row to know whether another page exists
+        params.append(limit + 1)
+        with self._connection() as conn:
+            rows = conn.execute(f"{SELECT_COLUMNS}{where} ORDER BY employee_id LIMIT ?", params).fetchall()
+        page = [dict(row) for row in rows[:limit]]
+        has_more = len(rows) > limit
+        return {
+            "employees": page,
+            "next_cursor": page[-1]["employee_id"] if has_more else None,
+        }
+
+    def columns(self, department: str | None = None) -> dict[str, list]:
+        """Every column for the whole population (or one department), in ID order."""
+        where, params = ("", ()) if department is None else (" WHERE department = ?", (department,))
+        with self._connection() as conn:
+            rows = conn.execute(f"{SELECT_COLUMNS}{where} ORDER BY employee_id", params).fetchall()
+        return {name: [row[i] for row in rows] for i, name in enumerate(COLUMNS)}
+
+    def close(self) -> None:
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+        self._anchor.close()
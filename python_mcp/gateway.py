@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+MCP Gateway
+
+Serves the calculator and weather servers from one process, on one event loop
+and behind one HTTP endpoint. Clients keep a single connection and session
+instead of one per server, and a host runs one interpreter instead of two.
+
+Each server is mounted under its own namespace, so tool and prompt names stay
+distinct: `calculator_add`, `weather_get-current-weather`, ... Mounted
+servers keep their own middleware (metrics, tracing, the loop watchdog) and
+share the process-wide HTTP client pool (http_pool.py). Their HTTP routes
+are served once each: both expose GET /metrics, rendering the same
+process-wide registry.
+
+Run with: python gateway.py
+Access at: http://localhost:8002/sse
+(takes the servers' flags and --config files, e.g. --transport streamable-http --port 9000;
+python gateway.py --help lists them; see server_cli.py and http_serving.py)
+
+Configured from the environment:
+    MCP_GATEWAY_SERVERS  comma-separated namespaces to mount (default: all in MOUNTS)
+"""
+
+import importlib
+import logging
+import os
+from types import ModuleType
+
+from fastmcp import FastMCP
+
+from log_setup import configure_logging
+from server_cli import apply_command_line, run_server
+
+if __name__ == "__main__":
+    # Before the servers are mounted: they read their settings as they are imported
+    apply_command_line(default_transport="sse")
+
+configure_logging()
+logger = logging.getLogger("mcp-gateway")
+
+# Namespace -> module defining `app`. Add a line here to mount another server.
+MOUNTS = {
+    "calculator": "calculator_server",
+    "weather": "weather_server",
+}
+
+
+class Gateway(FastMCP):
+    """A FastMCP app that serves each of its mounted servers' custom routes once."""
+
+    def _get_additional_http_routes(self):
+        routes, seen = [], set()
+        # Ours and then each mounted server's, in mount order: the first registration wins
+        for route in super()._get_additional_http_routes():
+            key = (getattr(route, "path", None), frozenset(getattr(route, "methods", None) or ()))
+            if key not in seen:
+                seen.add(key)
+                routes.append(route)
+        return routes
+
+
+def build_gateway(namespaces: list[str] | None = None) -> tuple[FastMCP, list[ModuleType]]:
+    """A FastMCP app with each requested server mounted under its namespace, and their modules."""
+    gateway = Gateway("mcp-gateway")
+    modules = []
+    for namespace in namespaces or list(MOUNTS):
+        if namespace not in MOUNTS:
+            raise ValueError(f"Unknown server '{namespace}' (expected one of {', '.join(MOUNTS)})")
+        module = importlib.import_module(MOUNTS[namespace])
+        gateway.mount(module.app, namespace=namespace)
+        modules.append(module)
+        logger.info("Mounted %s under namespace '%s'", module.app.name, namespace)
+    return gateway, modules
+
+
+app, mounted = build_gateway(
+    [name.strip() for name in os.environ.get("MCP_GATEWAY_SERVERS", "").split(",") if name.strip()]
+)
+
+
+def shutdown() -> None:
+    """Stop the process pools owned by mounted servers (the calculator's compute pool)."""
+    for module in mounted:
+        if hasattr(module, "compute_pool"):
+            module.compute_pool.shutdown()
+
+
+if __name__ == "__main__":
+    run_server(app, default_port=8002, shutdown=shutdown)
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Hot Locations
+
+Keeps a rolling count of the locations and forecast lengths the weather tools
+are asked for, persisted to a small JSON file, and replays the busiest ones
+at startup so that a new instance joins with its caches already warm.
+
+- Counts decay with a half-life, so the log follows the traffic: a location
+  nobody asks for any more drops out over a few days.
+- The log is written every SAVE_INTERVAL seconds and at shutdown, atomically,
+  keeping only the top entries.
+- The prefetch runs in the background right after startup, at a bounded rate
+  so that geocoding stays within Nominatim's usage policy, and can be repeated
+  on a schedule to keep the busiest locations fresh. Startup can instead wait
+  (up to a limit) for it to finish before taking traffic.
+- Of the processes sharing a log (workers.py), only the one holding a lock on
+  it prefetches and saves, so the rate limit holds for all of them together
+  and the file has a single writer. With connections spread across workers,
+  that worker's traffic is representative, so the others do not count at all.
+  Another takes over, checking every SAVE_INTERVAL, when it exits, starting
+  from the counts it saved.
+
+Reported on /metrics as mcp_prefetch_total (by result: ok or error) and
+mcp_hot_locations.
+
+Configured from the environment:
+    MCP_HOT_LOCATIONS_FILE  where the log is kept (unset: nothing is recorded or prefetched)
+    MCP_PREFETCH_TOP        entries replayed per prefetch (default 50)
+    MCP_PREFETCH_RATE       entries replayed per second (default 1)
+    MCP_PREFETCH_INTERVAL   seconds between prefetches after the first (default 0: startup only)
+    MCP_PREFETCH_WAIT       seconds startup waits for the first prefetch before serving (default 0)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable
+
+from metrics import REGISTRY, MetricsRegistry
+
+try:
+    import fcntl
+except ImportError:  # Windows: no locking, so every process keeps the log
+    fcntl = None
+
+logger = logging.getLogger("hot-locations")
+
+REGISTRY.describe("prefetch_total", "Hot locations replayed into the caches, by result.")
+REGISTRY.describe("hot_locations", "Locations currently counted in the hot-location log.")
+
+LOG_VERSION = 1
+SAVE_INTERVAL = 60.0
+# Counts halve over this many seconds
+HALF_LIFE = 86400.0
+# Counts that have decayed below this are forgotten
+MIN_COUNT = 0.01
+
+Warm = Callable[[str, int], Awaitable[None]]
+
+
+class HotLocations:
+    """Decaying request counts per (location, days), saved to and loaded from a file."""
+
+    def __init__(
+        self,
+        path: str | None,
+        max_entries: int = 1000,
+        top: int = 50,
+        rate: float = 1.0,
+        interval: float = 0.0,
+        wait: float = 0.0,
+        half_life: float = HALF_LIFE,
+        registry: MetricsRegistry = REGISTRY,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.top = top
+        self.rate = rate
+        self.interval = interval
+        self.wait = wait
+        self.half_life = half_life
+        self.registry = registry
+        self.counts: dict[tuple[str, int], float] = {}
+        self._decayed_at = time.time()
+        self._lock_file = None
+        self.leading = False
+        # Another process keeps the log: counting here would never be saved
+        self.following = False
+
+    def record(self, location: str, days: int) -> None:
+        if self.path is None or self.following:
+            return
+        key = (location, days)
+        self.counts[key] = self.counts.get(key, 0.0) + 1.0
+        # Pruned in batches, so a steady stream of new locations costs one sort per max_entries
+        if len(self.counts) > 2 * self.max_entries:
+            self.counts = dict(self._top(self.max_entries))
+
+    def _top(self, n: int) -> list[tuple[tuple[str, int], float]]:
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def top_entries(self, n: int | None = None) -> list[tuple[str, int]]:
+        """The `n` busiest (location, days), busiest first."""
+        return [key for key, _ in self._top(self.top if n is None else n)]
+
+    def decay(self, now: float | None = None) -> None:
+        now = time.time() if now is None else now
+        factor = 0.5 ** (max(0.0, now - self._decayed_at) / self.half_life)
+        self._decayed_at = now
+        self.counts = {key: count * factor for key, count in self.counts.items() if count * factor >= MIN_COUNT}
+        self.registry.set_gauge("hot_locations", len(self.counts))
+
+    def load(self) -> None:
+        """Merge in the saved log, aged by the time since it was saved."""
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("version") != LOG_VERSION:
+                raise ValueError(f"unknown version {saved.get('version')!r}")
+            factor = 0.5 ** (max(0.0, time.time() - saved["saved"]) / self.half_life)
+            for location, days, count in saved["entries"]:
+                key = (str(location), int(days))
+                self.counts[key] = self.counts.get(key, 0.0) + float(count) * factor
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Ignoring unreadable hot-location log %s: %s", self.path, e)
+            return
+        self.registry.set_gauge("hot_locations", len(self.counts))
+        logger.info("Loaded %d hot locations from %s", len(self.counts), self.path)
+
+    def save(self) -> None:
+        """Write the top entries, replacing the log in one step."""
+        if self.path is None:
+            return
+        self.decay()
+        entries = [[location, days, round(count, 3)] for (location, days), count in self._top(self.max_entries)]
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump({"version": LOG_VERSION, "saved": self._decayed_at, "entries": entries}, f, separators=(",", ":"))
+            os.replace(temporary, self.path)
+        except OSError as e:
+            logger.warning("Could not save the hot-location log to %s: %s", self.path, e)
+
+    async def prefetch(self, warm: Warm) -> int:
+        """Replay the busiest entries through `warm`, at most `rate` per second; the number warmed."""
+        entries = self.top_entries()
+        warmed = 0
+        started = time.monotonic()
+        for i, (location, days) in enumerate(entries):
+            if i and self.rate > 0:
+                await asyncio.sleep(1 / self.rate)
+            try:
+                await warm(location, days)
+            except Exception as e:
+                self.registry.inc("prefetch_total", result="error")
+                logger.debug("Prefetching %s (%d days) failed: %s", location, days, e)
+                continue
+            self.registry.inc("prefetch_total", result="ok")
+            warmed += 1
+        if entries:
+            logger.info("Prefetched %d of %d hot locations in %.1fs", warmed, len(entries), time.monotonic() - started)
+        return warmed
+
+    def _take_lead(self) -> bool:
+        """Become the process that prefetches and saves, unless another one already is."""
+        if not self.leading:
+            if fcntl is None:
+                self.leading = True
+                return True
+            try:
+                lock_file = open(f"{self.path}.lock", "a")
+            except OSError as e:
+                logger.warning("Could not open %s.lock, keeping the log unshared: %s", self.path, e)
+                self.leading = True
+                return True
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            self._lock_file, self.leading = lock_file, True
+        return self.leading
+
+    def _release_lead(self) -> None:
+        if self._lock_file is not None:
+            # Closing the file drops the lock
+            self._lock_file.close()
+            self._lock_file = None
+        self.leading = False
+
+    async def _prefetch_loop(self, warm: Warm) -> None:
+        while True:
+            await self.prefetch(warm)
+            if self.interval <= 0:
+                return
+            await asyncio.sleep(self.interval)
+
+    async def _save_loop(self) -> None:
+        while True:
+            await asyncio.sleep(SAVE_INTERVAL)
+            self.save()
+
+    async def _follow(self, warm: Warm) -> None:
+        while not self._take_lead():
+            await asyncio.sleep(SAVE_INTERVAL)
+        logger.info("Taking over prefetching and saving %s", self.path)
+        self.following = False
+        self.counts = {}
+        self.load()
+        await asyncio.gather(self._prefetch_loop(warm), self._save_loop())
+
+    @asynccontextmanager
+    async def running(self, warm: Warm) -> AsyncIterator[None]:
+        """Load the log and prefetch on entry, save it periodically and on exit (when leading)."""
+        if self.path is None:
+            yield
+            return
+        self.load()
+        if self._take_lead():
+            prefetching = asyncio.create_task(self._prefetch_loop(warm))
+            tasks = [prefetching, asyncio.create_task(self._save_loop())]
+            if self.wait > 0:
+                try:
+                    await asyncio.wait_for(asyncio.shield(prefetching), self.wait)
+                except asyncio.TimeoutError:
+                    logger.info("Prefetch still running after %.0fs; serving anyway", self.wait)
+        else:
+            logger.info("Another process keeps %s; not prefetching", self.path)
+            self.following = True
+            tasks = [asyncio.create_task(self._follow(warm))]
+        try:
+            yield
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.leading:
+                self.save()
+                self._release_lead()
+
+
+def hot_locations() -> HotLocations:
+    """A hot-location log configured from the environment."""
+    return HotLocations(
+        os.environ.get("MCP_HOT_LOCATIONS_FILE") or None,
+        top=int(os.environ.get("MCP_PREFETCH_TOP", "50")),
+        rate=float(os.environ.get("MCP_PREFETCH_RATE", "1")),
+        interval=float(os.environ.get("MCP_PREFETCH_INTERVAL", "0")),
+        wait=float(os.environ.get("MCP_PREFETCH_WAIT", "0")),
+    )
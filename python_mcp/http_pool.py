@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP Client
+
+One httpx.AsyncClient per process, shared by every tool that calls an
+upstream API. Connections to Open-Meteo stay open between tool calls instead
+of paying a TCP and TLS handshake per call, and servers mounted together in
+gateway.py share one pool rather than opening one each.
+
+An AsyncClient belongs to the event loop it first connected on, so a new
+client is created when the running loop changes (e.g. successive
+asyncio.run() calls in tests). http_serving.serve() closes the client on
+shutdown.
+
+Configured from the environment:
+    MCP_HTTP_MAX_CONNECTIONS   connections open at once (default 100)
+    MCP_HTTP_MAX_KEEPALIVE     idle connections kept for reuse (default 20)
+    MCP_HTTP_KEEPALIVE_EXPIRY  seconds an idle connection is kept (default 30)
+"""
+
+import asyncio
+import logging
+import os
+
+import httpx
+
+logger = logging.getLogger("http-pool")
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.environ.get("MCP_HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.environ.get("MCP_HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.environ.get("MCP_HTTP_KEEPALIVE_EXPIRY", "30")),
+    )
+
+
+def get_client() -> httpx.AsyncClient:
+    """The shared client for the running event loop, created on first use."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        # A client left behind by a finished loop cannot be closed from this one;
+        # its connections went with that loop
+        _client = httpx.AsyncClient(limits=_limits())
+        _client_loop = loop
+        logger.debug("Created shared HTTP client")
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared client if it belongs to the running loop."""
+    global _client, _client_loop
+    if _client is not None and _client_loop is asyncio.get_running_loop():
+        await _client.aclose()
+    _client = None
+    _client_loop = None
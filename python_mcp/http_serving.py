@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+HTTP Serving
+
+Runs a FastMCP app over HTTP with the transport chosen by configuration:
+
+- sse: a long-lived event stream per client plus one POST per message
+  (endpoint /sse). The default, for compatibility with existing clients.
+- streamable-http: the MCP streamable HTTP transport (endpoint /mcp). By
+  default tool calls are a single POST answered with plain JSON, which
+  carries the result only; with streamed responses, each POST is answered
+  with an event stream that also carries progress notifications. With an
+  event store, a client that reconnects with `Last-Event-ID` resumes its
+  session instead of re-initializing.
+
+Configured from the environment:
+    MCP_TRANSPORT      sse (default) or streamable-http; a comma-separated list
+                       may also name stdio, served alongside (see server_cli.py)
+    MCP_HOST           bind address (default 127.0.0.1)
+    MCP_PORT           port (default: the server's usual port)
+    MCP_PATH           endpoint path (default /sse or /mcp)
+    MCP_JSON_RESPONSE  1 (default) answers POSTs with JSON; 0 streams them (needed for progress)
+    MCP_STATELESS      1 for stateless streamable HTTP: no sessions, any
+                       worker or replica can serve any request
+    MCP_RESUMABLE      1 (default) keeps an in-memory event store for resumption
+    MCP_LOOP           asyncio (default), uvloop, or auto (uvloop when installed)
+    MCP_BACKLOG        listen backlog: connections the kernel queues before
+                       they are accepted (default 2048)
+    MCP_KEEPALIVE      seconds an idle HTTP/1.1 connection is kept open for the
+                       client's next POST (default 75)
+    MCP_TCP_KEEPALIVE  seconds of silence before TCP keepalive probes check that
+                       a peer (an SSE stream) is still there (default 60; 0 disables)
+
+Listeners set TCP_NODELAY, so small JSON-RPC replies are never held back
+waiting to be coalesced, and the TCP keepalive options; accepted connections
+inherit both. The loop, HTTP parser and socket settings are logged at startup.
+
+Response bodies are coalesced, gzip-compressed and chunked on the way out
+(see response_writes.py). GET /health answers on every transport. Worker processes started by
+workers.py additionally get MCP_WORKER_SLOT, MCP_PRIVATE_PORT and
+MCP_PEER_PORTS, and bind the public port with SO_REUSEPORT.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from typing import Any, Coroutine
+
+import uvicorn
+from fastmcp.server.event_store import EventStore
+
+from http_pool import close_client
+from response_writes import shape_writes
+from workers import HealthCheck, bind_socket, worker_setup
+
+try:
+    import uvloop
+except ImportError:  # uvloop is optional (and not available on Windows); asyncio is used instead
+    uvloop = None
+
+logger = logging.getLogger("http-serving")
+
+TRANSPORTS = ("sse", "streamable-http")
+LOOPS = ("asyncio", "uvloop", "auto")
+
+# Events kept per stream for resumption, and how long they are kept
+RESUME_EVENTS_PER_STREAM = 100
+RESUME_TTL_SECONDS = 600
+
+# Once TCP keepalive starts probing a silent peer: seconds between probes,
+# and unanswered probes before the connection is dropped
+TCP_KEEPALIVE_INTERVAL = 10
+TCP_KEEPALIVE_PROBES = 3
+
+
+def _flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    return default if value is None else value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _http_transport(value: str) -> str:
+    names = [name.strip().lower() for name in value.split(",")]
+    names = [name for name in names if name and name != "stdio"]
+    return names[0] if names else "sse"
+
+
+class HttpSettings:
+    """Transport, address and streamable-HTTP options for one server."""
+
+    def __init__(
+        self,
+        transport: str = "sse",
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        path: str | None = None,
+        json_response: bool = True,
+        stateless: bool = False,
+        resumable: bool = True,
+        worker_slot: int | None = None,
+        private_port: int | None = None,
+        peer_ports: list[int] | None = None,
+        loop: str = "asyncio",
+        backlog: int = 2048,
+        keepalive: int = 75,
+        tcp_keepalive: int = 60,
+    ):
+        if transport == "http":
+            transport = "streamable-http"
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport '{transport}' (expected one of {', '.join(TRANSPORTS)})")
+        if stateless and transport == "sse":
+            raise ValueError("The SSE transport cannot run stateless; use streamable-http")
+        if loop not in LOOPS:
+            raise ValueError(f"Unknown event loop '{loop}' (expected one of {', '.join(LOOPS)})")
+        self.transport = transport
+        self.host = host
+        self.port = port
+        self.path = path or ("/sse" if transport == "sse" else "/mcp")
+        self.json_response = json_response
+        self.stateless = stateless
+        # Stateless servers have no sessions to resume
+        self.resumable = resumable and not stateless
+        # Set only in worker processes started by workers.py
+        self.worker_slot = worker_slot
+        self.private_port = private_port
+        self.peer_ports = peer_ports or []
+        self.loop = loop
+        self.backlog = backlog
+        self.keepalive = keepalive
+        self.tcp_keepalive = tcp_keepalive
+
+    @classmethod
+    def from_env(cls, default_port: int) -> "HttpSettings":
+        return cls(
+            transport=_http_transport(os.environ.get("MCP_TRANSPORT", "sse")),
+            host=os.environ.get("MCP_HOST", "127.0.0.1"),
+            port=int(os.environ.get("MCP_PORT", default_port)),
+            path=os.environ.get("MCP_PATH") or None,
+            json_response=_flag("MCP_JSON_RESPONSE", True),
+            stateless=_flag("MCP_STATELESS", False),
+            resumable=_flag("MCP_RESUMABLE", True),
+            worker_slot=int(os.environ["MCP_WORKER_SLOT"]) if "MCP_WORKER_SLOT" in os.environ else None,
+            private_port=int(os.environ.get("MCP_PRIVATE_PORT", 0)) or None,
+            peer_ports=[int(p) for p in os.environ.get("MCP_PEER_PORTS", "").split(",") if p],
+            loop=os.environ.get("MCP_LOOP", "asyncio").strip().lower(),
+            backlog=int(os.environ.get("MCP_BACKLOG", 2048)),
+            keepalive=int(os.environ.get("MCP_KEEPALIVE", 75)),
+            tcp_keepalive=int(os.environ.get("MCP_TCP_KEEPALIVE", 60)),
+        )
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}{self.path}"
+
+    def describe(self) -> str:
+        if self.transport == "sse":
+            return "SSE"
+        options = ["stateless" if self.stateless else "sessions"]
+        options.append("JSON responses" if self.json_response else "streamed responses")
+        if self.resumable:
+            options.append("resumable")
+        return f"streamable HTTP ({', '.join(options)})"
+
+
+def resolve_loop(name: str) -> str:
+    """The event loop to run for a configured MCP_LOOP: "asyncio" or "uvloop"."""
+    if name == "asyncio" or (name == "auto" and uvloop is None):
+        return "asyncio"
+    if uvloop is None:
+        logger.warning("uvloop is not installed (pip install uvloop); using the asyncio event loop")
+        return "asyncio"
+    return "uvloop"
+
+
+def tune_listener(sock: socket.socket, settings: HttpSettings) -> None:
+    """Set the options accepted connections inherit from their listener."""
+    if sock.family not in (socket.AF_INET, socket.AF_INET6):
+        return
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if settings.tcp_keepalive > 0:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # Not every platform has the per-socket timings (macOS lacks TCP_KEEPIDLE)
+        for option, value in (
+            ("TCP_KEEPIDLE", settings.tcp_keepalive),
+            ("TCP_KEEPINTVL", TCP_KEEPALIVE_INTERVAL),
+            ("TCP_KEEPCNT", TCP_KEEPALIVE_PROBES),
+        ):
+            if hasattr(socket, option):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+
+def build_asgi_app(app, settings: HttpSettings):
+    """The Starlette app serving `app` with the configured transport."""
+    if settings.transport == "sse":
+        return app.http_app(transport="sse", path=settings.path)
+    event_store = None
+    if settings.resumable:
+        event_store = EventStore(max_events_per_stream=RESUME_EVENTS_PER_STREAM, ttl=RESUME_TTL_SECONDS)
+    return app.http_app(
+        transport="streamable-http",
+        path=settings.path,
+        json_response=settings.json_response,
+        stateless_http=settings.stateless,
+        event_store=event_store,
+    )
+
+
+async def serve(
+    app,
+    settings: HttpSettings,
+    sockets: list[socket.socket] | None = None,
+    uvicorn_config: dict[str, Any] | None = None,
+) -> None:
+    """Serve until shut down; `sockets` are pre-bound listeners to use instead of host/port."""
+    asgi = build_asgi_app(app, settings)
+    if settings.worker_slot is not None and sockets is None:
+        asgi, sockets = worker_setup(asgi, settings)
+    else:
+        asgi = HealthCheck(asgi)
+        if sockets is None:
+            # Bind here rather than in uvicorn, so the listener can be tuned
+            sockets = [bind_socket(settings.host, settings.port, backlog=settings.backlog)]
+    for sock in sockets:
+        tune_listener(sock, settings)
+    # Outermost, so wrappers inside it (the session relay) see plain bodies
+    asgi = shape_writes(asgi)
+    config = uvicorn.Config(
+        asgi,
+        host=settings.host,
+        port=settings.port,
+        lifespan="on",
+        backlog=settings.backlog,
+        timeout_keep_alive=settings.keepalive,
+        timeout_graceful_shutdown=2,
+        log_level="warning",
+        **(uvicorn_config or {}),
+    )
+    config.load()
+    if settings.worker_slot is not None:
+        logger.info("Worker %d serving %s over %s at %s", settings.worker_slot, app.name, settings.describe(), settings.url)
+    else:
+        logger.info("Serving %s over %s at %s", app.name, settings.describe(), settings.url)
+    loop = "uvloop" if type(asyncio.get_running_loop()).__module__.startswith("uvloop") else "asyncio"
+    parser = "httptools" if "httptools" in config.http_protocol_class.__module__ else "h11"
+    tcp_keepalive = f"TCP keepalive after {settings.tcp_keepalive}s idle" if settings.tcp_keepalive > 0 else "no TCP keepalive"
+    logger.info(
+        "Event loop %s, HTTP parser %s; backlog %d, TCP_NODELAY, %s, HTTP keep-alive %ds",
+        loop, parser, settings.backlog, tcp_keepalive, settings.keepalive,
+    )
+    server = uvicorn.Server(config)
+    serving = asyncio.ensure_future(server.serve(sockets=sockets))
+    try:
+        await asyncio.shield(serving)
+    except asyncio.CancelledError:
+        # Shut down as on a signal: open requests get timeout_graceful_shutdown to finish
+        server.should_exit = True
+        await serving
+        raise
+    finally:
+        # Cancelled, uvicorn skips its shutdown and leaves the listeners
+        # registered with the loop; a new socket reusing the fd would never accept
+        for listener in getattr(server, "servers", []):
+            listener.close()
+        await close_client()
+
+
+def run_until_complete(main: Coroutine[Any, Any, None], loop: str = "asyncio") -> None:
+    """Run `main` to completion on the event loop configured as `loop` (MCP_LOOP)."""
+    if resolve_loop(loop) == "uvloop":
+        uvloop.run(main)
+    else:
+        asyncio.run(main)
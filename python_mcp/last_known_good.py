@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Last-Known-Good Results
+
+Keeps the last successful upstream result per key (a location) and reuses it:
+
+- Within its time to live, a result is answered from the store without
+  asking the upstream again (repeated lookups of a busy location, and
+  locations prefetched at startup; see hot_locations.py).
+- Past that, it is served clearly labelled as stale when the upstream fails.
+  During an upstream incident an agent then gets a usable answer instead of
+  an error it would retry, so retries stop multiplying the load on the
+  failing upstream.
+
+- Only failures that mean "the upstream is unwell" fall back (429, 5xx,
+  timeouts, connection errors; see adaptive_limit.is_overload). A bad request
+  still fails, and so does a call whose own deadline has run out.
+- After such a failure, calls that have a stale result to give skip the
+  upstream for the hold period and answer at once, so latency stays flat
+  while the upstream is down. Calls with nothing stored still try it, and the
+  first call after the hold probes it again.
+- The store is bounded: entries older than the maximum age are never served,
+  and the least recently used entry is dropped once it is full.
+
+Reported on /metrics as mcp_cache_hits_total, mcp_stale_served_total (by
+upstream and reason: error, or hold) and mcp_stale_entries.
+
+Configured from the environment (the time to live is set per upstream by its server):
+    MCP_STALE_MAX_ENTRIES  results kept per upstream (default 2000; 0 disables the store)
+    MCP_STALE_MAX_AGE      seconds a result may be served for after it was fetched (default 21600)
+    MCP_STALE_HOLD         seconds after an upstream failure during which stored
+                           results are served without retrying it (default 10)
+"""
+
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Hashable
+
+from adaptive_limit import is_overload
+from deadlines import DeadlineExceeded
+from metrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger("last-known-good")
+
+REGISTRY.describe("cache_hits_total", "Upstream results reused within their time to live.")
+REGISTRY.describe("stale_served_total", "Stale results served in place of a failing upstream, by reason.")
+REGISTRY.describe("stale_entries", "Last-known-good results currently stored per upstream.")
+
+
+class LastKnownGood:
+    """Last successful result per key for one upstream, bounded in count and age."""
+
+    def __init__(
+        self,
+        upstream: str,
+        max_entries: int = 2000,
+        max_age: float = 21600.0,
+        hold: float = 10.0,
+        ttl: float = 0.0,
+        registry: MetricsRegistry = REGISTRY,
+    ):
+        self.upstream = upstream
+        self.max_entries = max_entries
+        # Anything still fresh must also be servable
+        self.max_age = max(max_age, ttl)
+        self.hold = hold
+        self.ttl = ttl
+        self.registry = registry
+        # key -> (result, monotonic time it was fetched), least recently used first
+        self._entries: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._failing_until = float("-inf")
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0 or value is None:
+            return
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self.registry.set_gauge("stale_entries", len(self._entries), upstream=self.upstream)
+
+    def get(self, key: Hashable) -> tuple[Any, float] | None:
+        """The stored result for `key` and its age in seconds, if not too old."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, fetched = entry
+        age = time.monotonic() - fetched
+        if age > self.max_age:
+            del self._entries[key]
+            self.registry.set_gauge("stale_entries", len(self._entries), upstream=self.upstream)
+            return None
+        self._entries.move_to_end(key)
+        return value, age
+
+    @property
+    def holding(self) -> bool:
+        """Whether the upstream failed recently enough to be left alone."""
+        return time.monotonic() < self._failing_until
+
+    async def fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> tuple[Any, float | None]:
+        """
+        A result for `key` and None when it is current: the stored one within
+        its time to live, else `fetch()`'s (stored for later; None is not).
+        When the upstream is failing, the stored result and its age in seconds.
+        """
+        stored = self.get(key)
+        if stored is not None and stored[1] < self.ttl:
+            self.registry.inc("cache_hits_total", upstream=self.upstream)
+            return stored[0], None
+        if stored is not None and self.holding:
+            self.registry.inc("stale_served_total", upstream=self.upstream, reason="hold")
+            return stored
+        try:
+            value = await fetch()
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            if not is_overload(e):
+                raise
+            self._failing_until = time.monotonic() + self.hold
+            if stored is None:
+                raise
+            logger.warning(
+                "%s failed (%s: %s); serving a result from %.0fs ago",
+                self.upstream, type(e).__name__, e, stored[1],
+            )
+            self.registry.inc("stale_served_total", upstream=self.upstream, reason="error")
+            return stored
+        self._failing_until = float("-inf")
+        self.put(key, value)
+        return value, None
+
+
+def stale_notice(upstream: str, age: float) -> str:
+    """The label put in front of a stale result."""
+    fetched = datetime.fromtimestamp(time.time() - age, timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+    minutes = round(age / 60)
+    ago = f"{minutes} min" if minutes < 120 else f"{minutes / 60:.1f} h"
+    return (
+        f"STALE DATA: {upstream} is unavailable right now. This is the last known result, "
+        f"fetched {fetched} ({ago} ago); retrying will not get fresher data until it recovers.\n\n"
+    )
+
+
+def last_known_good(upstream: str, ttl: float = 0.0) -> LastKnownGood:
+    """A last-known-good store for `upstream` configured from the environment."""
+    return LastKnownGood(
+        upstream,
+        max_entries=int(os.environ.get("MCP_STALE_MAX_ENTRIES", "2000")),
+        max_age=float(os.environ.get("MCP_STALE_MAX_AGE", "21600")),
+        hold=float(os.environ.get("MCP_STALE_HOLD", "10")),
+        ttl=ttl,
+    )
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Linear Algebra Helpers
+
+Matrix products, solves, determinants and inverses on top of NumPy/BLAS.
+Matrices travel either as JSON nested lists or in a compact binary form:
+
+    {"shape": [rows, cols], "dtype": "<f8", "data": "<base64 little-endian float64>"}
+
+Binary input is decoded with numpy.frombuffer, so no per-element parsing
+happens and large matrices cost a fraction of the JSON payload.
+"""
+
+import base64
+import math
+from typing import Any
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the matrix tools report it as missing
+    np = None
+
+BINARY_DTYPE = "<f8"
+
+# Refuse anything bigger than this many elements per matrix (32 MB of float64)
+MAX_ELEMENTS = 4_000_000
+
+# Operations on matrices with more elements than this run off the event loop
+INLINE_ELEMENTS = 10_000
+
+MatrixSpec = list[list[float]] | list[float] | dict[str, Any]
+
+
+def require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("NumPy is not installed; run `pip install numpy` to enable matrix tools")
+
+
+def decode_matrix(spec: MatrixSpec, name: str = "matrix") -> "np.ndarray":
+    """Decode a JSON nested list or a base64 binary matrix into a float64 array."""
+    require_numpy()
+    if isinstance(spec, dict):
+        dtype = spec.get("dtype", BINARY_DTYPE)
+        if np.dtype(dtype) != np.dtype(BINARY_DTYPE):
+            raise ValueError(f"{name}: only little-endian float64 ('{BINARY_DTYPE}') is supported")
+        shape = tuple(int(n) for n in spec["shape"])
+        if math.prod(shape) > MAX_ELEMENTS:
+            raise ValueError(f"{name}: {math.prod(shape)} elements exceeds the limit of {MAX_ELEMENTS}")
+        raw = base64.b64decode(spec["data"], validate=True)
+        expected = math.prod(shape) * 8
+        if len(raw) != expected:
+            raise ValueError(f"{name}: shape {list(shape)} needs {expected} bytes, got {len(raw)}")
+        array = np.frombuffer(raw, dtype=BINARY_DTYPE).reshape(shape)
+    else:
+        array = np.asarray(spec, dtype=np.float64)
+
+    if array.ndim not in (1, 2):
+        raise ValueError(f"{name}: expected a vector or a 2-D matrix, got {array.ndim} dimensions")
+    if array.size > MAX_ELEMENTS:
+        raise ValueError(f"{name}: {array.size} elements exceeds the limit of {MAX_ELEMENTS}")
+    return array
+
+
+def encode_matrix(array: "np.ndarray", encoding: str = "json") -> Any:
+    """Encode an array as nested lists ("json") or the compact binary form ("base64")."""
+    if encoding == "json":
+        return array.tolist()
+    if encoding == "base64":
+        contiguous = np.ascontiguousarray(array, dtype=BINARY_DTYPE)
+        return {
+            "shape": list(contiguous.shape),
+            "dtype": BINARY_DTYPE,
+            "data": base64.b64encode(contiguous.tobytes()).decode("ascii"),
+        }
+    raise ValueError(f"Unknown encoding '{encoding}', use 'json' or 'base64'")
+
+
+def _square(array: "np.ndarray", name: str) -> None:
+    if array.ndim != 2 or array.shape[0] != array.shape[1]:
+        raise ValueError(f"{name} must be a square matrix, got shape {list(array.shape)}")
+
+
+def matrix_multiply(a: MatrixSpec, b: MatrixSpec, encoding: str = "json") -> dict[str, Any]:
+    """Matrix product a @ b."""
+    left, right = decode_matrix(a, "a"), decode_matrix(b, "b")
+    if left.shape[-1] != right.shape[0]:
+        raise ValueError(f"Cannot multiply shapes {list(left.shape)} and {list(right.shape)}")
+    product = left @ right
+    return {"shape": list(product.shape), "result": encode_matrix(product, encoding)}
+
+
+def matrix_solve(a: MatrixSpec, b: MatrixSpec, encoding: str = "json") -> dict[str, Any]:
+    """Solve a @ x = b for x."""
+    left, right = decode_matrix(a, "a"), decode_matrix(b, "b")
+    _square(left, "a")
+    solution = np.linalg.solve(left, right)
+    return {"shape": list(solution.shape), "result": encode_matrix(solution, encoding)}
+
+
+def matrix_determinant(a: MatrixSpec) -> dict[str, Any]:
+    """Determinant of a, with its log-magnitude for values that over/underflow."""
+    matrix = decode_matrix(a, "a")
+    _square(matrix, "a")
+    sign, logabsdet = np.linalg.slogdet(matrix)
+    if sign == 0:
+        return {"determinant": 0.0, "sign": 0.0, "log_abs_determinant": None}
+    return {
+        "determinant": float(sign * math.exp(logabsdet)) if logabsdet < 709 else None,
+        "sign": float(sign),
+        "log_abs_determinant": float(logabsdet),
+    }
+
+
+def matrix_inverse(a: MatrixSpec, encoding: str = "json") -> dict[str, Any]:
+    """Inverse of a."""
+    matrix = decode_matrix(a, "a")
+    _square(matrix, "a")
+    inverse = np.linalg.inv(matrix)
+    return {"shape": list(inverse.shape), "result": encode_matrix(inverse, encoding)}
+
+
+def element_count(*specs: MatrixSpec) -> int:
+    """Cheap size estimate used to decide whether to leave the event loop."""
+    total = 0
+    for spec in specs:
+        if isinstance(spec, dict):
+            total += math.prod(int(n) for n in spec.get("shape", ()))
+        elif spec and isinstance(spec[0], list):
+            total += len(spec) * len(spec[0])
+        else:
+            total += len(spec)
+    return total
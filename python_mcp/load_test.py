@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+SSE Load Generator
+
+Opens N concurrent MCP sessions against a running HTTP server (see
+run_http_servers.sh) and replays a weighted mix of tool calls at a target
+rate, stepping the rate up until the server saturates.
+
+The generator is open-loop: calls are issued on a fixed schedule whether or
+not earlier calls have finished, and latency is measured from the time a call
+was *scheduled*, not when it was sent. A stalled server therefore shows up as
+rising latency instead of a quietly reduced request rate (coordinated
+omission).
+
+For every step it reports achieved throughput, error rate and the latency
+distribution, and names the saturation point: the first step whose p99
+exceeds the SLO, whose error rate exceeds the limit, or which could not
+sustain the offered rate.
+
+Each session is its own client to the per-client rate limit (rate_limit.py);
+start the server with MCP_RATE_LIMIT=0 to measure raw capacity instead.
+
+Usage:
+    python load_test.py --url http://127.0.0.1:8000/sse --sessions 50 --rates 50,100,200,400
+    python load_test.py --url http://127.0.0.1:8001/sse --mix "get-current-weather=3,get-forecast=1"
+    python load_test.py --start-rate 20 --step-rate 20 --steps 10 --step-seconds 15 --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import sys
+import time
+from contextlib import AsyncExitStack
+from typing import Any
+
+from fastmcp import Client
+
+# Arguments used for each tool in a mix (override with --arguments)
+TOOL_ARGUMENTS: dict[str, dict[str, Any]] = {
+    "add": {"a": 5, "b": 3},
+    "subtract": {"a": 5, "b": 3},
+    "multiply": {"a": 5, "b": 3},
+    "divide": {"a": 6, "b": 3},
+    "power": {"base": 5, "exponent": 3},
+    "square_root": {"number": 144},
+    "factorial": {"n": 20},
+    "calculate": {"expression": "2 ^ 10"},
+    "statistics": {"values": [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]},
+    "hr_add_numbers_fast": {"a": 5, "b": 3},
+    "hr_add_numbers": {"a": 5, "b": 3},
+    "get-current-weather": {"location": "51.5074,-0.1278"},
+    "get-forecast": {"location": "51.5074,-0.1278", "days": 7},
+}
+
+DEFAULT_MIX = "add=4,calculate=2,hr_add_numbers_fast=1"
+
+
+def parse_mix(spec: str) -> list[tuple[str, float]]:
+    mix = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, weight = item.partition("=")
+        mix.append((name.strip(), float(weight or 1)))
+    if not mix:
+        raise ValueError("empty tool mix")
+    return mix
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class StepResult:
+    """Outcomes of the calls scheduled during one load step."""
+
+    def __init__(self, rate: float, duration: float):
+        self.rate = rate
+        self.duration = duration
+        self.scheduled = 0
+        self.latencies: list[float] = []
+        self.errors: dict[str, int] = {}
+        # Successful calls that finished before the step ended (throughput)
+        self.ok_in_step = 0
+        self.ended: float | None = None
+        # How late the generator itself issued calls; large values mean the
+        # load generator, not the server, was the bottleneck
+        self.send_lag: list[float] = []
+
+    def record(self, latency: float, error: str | None, completed_at: float) -> None:
+        self.latencies.append(latency)
+        if error is not None:
+            self.errors[error] = self.errors.get(error, 0) + 1
+        elif self.ended is None or completed_at <= self.ended:
+            self.ok_in_step += 1
+
+    def summary(self) -> dict[str, Any]:
+        latencies = sorted(self.latencies)
+        send_lag = sorted(self.send_lag)
+        error_count = sum(self.errors.values())
+        return {
+            "target_rate": self.rate,
+            "offered_rate": round(self.scheduled / self.duration, 1),
+            "achieved_rate": round(self.ok_in_step / self.duration, 1),
+            "scheduled": self.scheduled,
+            "completed": len(latencies),
+            "errors": error_count,
+            "error_rate": round(error_count / len(latencies), 4) if latencies else 0.0,
+            "error_kinds": self.errors,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p90_ms": round(percentile(latencies, 90) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "p999_ms": round(percentile(latencies, 99.9) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            "generator_lag_p99_ms": round(percentile(send_lag, 99) * 1000, 2),
+        }
+
+
+class LoadGenerator:
+    """Open-loop scheduler spreading calls across a pool of MCP sessions."""
+
+    def __init__(
+        self,
+        url: str,
+        sessions: int,
+        mix: list[tuple[str, float]],
+        arguments: dict[str, dict[str, Any]],
+        timeout: float = 30.0,
+        max_in_flight: int = 10_000,
+        poisson: bool = True,
+    ):
+        self.url = url
+        self.session_count = sessions
+        self.tools = [name for name, _ in mix]
+        self.weights = [weight for _, weight in mix]
+        self.arguments = arguments
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.poisson = poisson
+        self.clients: list[Client] = []
+        self.in_flight: set[asyncio.Task] = set()
+
+    async def connect(self, stack: AsyncExitStack) -> float:
+        """Open every session concurrently; returns the time it took."""
+        start = time.perf_counter()
+        clients = [Client(self.url, timeout=self.timeout) for _ in range(self.session_count)]
+        await asyncio.gather(*(stack.enter_async_context(client) for client in clients))
+        self.clients = clients
+        return time.perf_counter() - start
+
+    async def _call(self, step: StepResult, client: Client, tool: str, intended: float) -> None:
+        error = None
+        try:
+            result = await asyncio.wait_for(
+                client.call_tool(tool, self.arguments.get(tool, {}), raise_on_error=False),
+                self.timeout,
+            )
+            if result.is_error:
+                error = "tool_error"
+            elif result.content and getattr(result.content[0], "text", "").startswith("Error"):
+                error = "tool_error"
+        except asyncio.TimeoutError:
+            error = "timeout"
+        except Exception as e:
+            error = type(e).__name__
+        now = time.perf_counter()
+        step.record(now - intended, error, now)
+
+    async def run_step(self, step: StepResult) -> None:
+        """Issue calls at `step.rate` per second for `step.duration` seconds."""
+        start = time.perf_counter()
+        end = start + step.duration
+        intended = start
+        session = 0
+        while True:
+            gap = random.expovariate(step.rate) if self.poisson else 1.0 / step.rate
+            intended += gap
+            if intended >= end:
+                break
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # When behind schedule, fire immediately: latency still counts from `intended`
+            step.scheduled += 1
+            step.send_lag.append(max(time.perf_counter() - intended, 0.0))
+            if len(self.in_flight) >= self.max_in_flight:
+                step.record(time.perf_counter() - intended, "client_overloaded", time.perf_counter())
+                continue
+            tool = random.choices(self.tools, self.weights)[0]
+            client = self.clients[session % len(self.clients)]
+            session += 1
+            task = asyncio.create_task(self._call(step, client, tool, intended))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+        step.ended = time.perf_counter()
+
+    async def drain(self) -> None:
+        if self.in_flight:
+            await asyncio.wait(list(self.in_flight))
+
+
+def find_saturation(steps: list[dict[str, Any]], slo_ms: float, max_error_rate: float) -> dict[str, Any] | None:
+    """First step that breaks the SLO, the error budget, or cannot keep up with the offered rate."""
+    for step in steps:
+        reasons = []
+        if step["p99_ms"] > slo_ms:
+            reasons.append(f"p99 {step['p99_ms']}ms > {slo_ms}ms")
+        if step["error_rate"] > max_error_rate:
+            reasons.append(f"error rate {step['error_rate']:.2%} > {max_error_rate:.2%}")
+        # Against the rate actually offered, so Poisson jitter is not mistaken for saturation
+        if step["achieved_rate"] < 0.9 * step["offered_rate"]:
+            reasons.append(f"completed {step['achieved_rate']}/s of {step['offered_rate']}/s offered")
+        if reasons:
+            return {"target_rate": step["target_rate"], "reasons": reasons}
+    return None
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    mix = parse_mix(args.mix)
+    arguments = dict(TOOL_ARGUMENTS)
+    for item in args.arguments:
+        tool, _, raw = item.partition("=")
+        arguments[tool] = json.loads(raw)
+    if args.rates:
+        rates = [float(rate) for rate in args.rates.split(",")]
+    else:
+        rates = [args.start_rate + i * args.step_rate for i in range(args.steps)]
+
+    generator = LoadGenerator(
+        args.url, args.sessions, mix, arguments,
+        timeout=args.timeout, max_in_flight=args.max_in_flight, poisson=args.arrivals == "poisson",
+    )
+    steps: list[dict[str, Any]] = []
+    async with AsyncExitStack() as stack:
+        connect_seconds = await generator.connect(stack)
+        print(f"Opened {args.sessions} sessions to {args.url} in {connect_seconds:.2f}s", flush=True)
+        if args.warmup_seconds > 0:
+            # Unrecorded: lets connections, caches and worker pools settle at the first rate
+            await generator.run_step(StepResult(rates[0], args.warmup_seconds))
+            await generator.drain()
+        results = []
+        for rate in rates:
+            step = StepResult(rate, args.step_seconds)
+            results.append(step)
+            await generator.run_step(step)
+            if args.stop_on_saturation:
+                # The calls still running are the slowest of the step; judge it only once they are in
+                await generator.drain()
+            summary = step.summary()
+            steps.append(summary)
+            print(
+                f"rate {rate:>7.1f}/s  achieved {summary['achieved_rate']:>7.1f}/s  "
+                f"p50 {summary['p50_ms']:>8.2f}ms  p99 {summary['p99_ms']:>8.2f}ms  "
+                f"max {summary['max_ms']:>8.2f}ms  errors {summary['error_rate']:.2%}  "
+                f"in flight {len(generator.in_flight)}",
+                flush=True,
+            )
+            if summary["generator_lag_p99_ms"] > 0.1 * args.slo_ms:
+                print(
+                    f"  warning: the generator fell behind schedule (p99 {summary['generator_lag_p99_ms']}ms); "
+                    "results at this rate are bounded by the client",
+                    flush=True,
+                )
+            if args.stop_on_saturation and find_saturation([summary], args.slo_ms, args.max_error_rate):
+                break
+        # Calls still running at the end of a step complete into that step's results
+        await generator.drain()
+        steps = [step.summary() for step in results]
+
+    saturation = find_saturation(steps, args.slo_ms, args.max_error_rate)
+    if saturation:
+        print(f"\nSaturation at {saturation['target_rate']}/s: {'; '.join(saturation['reasons'])}")
+    else:
+        print("\nNo saturation within the tested rates")
+    return {
+        "url": args.url,
+        "sessions": args.sessions,
+        "mix": dict(mix),
+        "step_seconds": args.step_seconds,
+        "slo_ms": args.slo_ms,
+        "max_error_rate": args.max_error_rate,
+        "connect_seconds": round(connect_seconds, 3),
+        "steps": steps,
+        "saturation": saturation,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Open-loop load generator for the MCP SSE servers.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/sse", help="SSE endpoint of a running server")
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent MCP sessions (default 20)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f'weighted tool mix (default "{DEFAULT_MIX}")')
+    parser.add_argument("--arguments", action="append", default=[], metavar="TOOL=JSON",
+                        help="arguments for a tool in the mix, e.g. 'factorial={\"n\": 500}'")
+    parser.add_argument("--rates", help="comma-separated target rates in calls/s, e.g. 50,100,200")
+    parser.add_argument("--start-rate", type=float, default=10.0)
+    parser.add_argument("--step-rate", type=float, default=10.0)
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--step-seconds", type=float, default=10.0, help="duration of each step (default 10)")
+    parser.add_argument("--warmup-seconds", type=float, default=3.0, help="unrecorded warm-up at the first rate")
+    parser.add_argument("--arrivals", choices=("poisson", "uniform"), default="poisson")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-call timeout in seconds")
+    parser.add_argument("--max-in-flight", type=int, default=10_000)
+    parser.add_argument("--slo-ms", type=float, default=500.0, help="p99 latency objective (default 500ms)")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="error budget (default 1%%)")
+    parser.add_argument(
+        "--stop-on-saturation", action="store_true",
+        help="stop ramping at the first saturated step (each step's calls finish before the next starts)",
+    )
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Logging Setup
+
+Keeps logging off the tool hot path:
+- records are handed to a QueueHandler and formatted/written by a
+  QueueListener thread, so the event loop never blocks on stderr;
+- messages use lazy %-style arguments, formatted only if the record is
+  actually emitted (optionally as one JSON object per line);
+- per-tool sampling drops a configurable share of routine INFO lines
+  (records logged with extra={"tool": name}); warnings and errors are
+  never sampled;
+- step-level traces are DEBUG records on a separate "trace" logger that
+  can be switched on and off at runtime (set_trace_enabled or SIGUSR1).
+
+Configured from the environment:
+    MCP_LOG_LEVEL   INFO (default), DEBUG, WARNING, ...
+    MCP_LOG_MODE    async (default) or sync
+    MCP_LOG_FORMAT  text (default) or json
+    MCP_LOG_SAMPLE  per-tool keep rates, e.g. "add=0.01,power=0.1,*=1"
+    MCP_LOG_TRACE   1 to start with step-level traces enabled
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import signal
+import sys
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else came from `extra=` and is
+# emitted as a structured field.
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_trace_loggers: list[logging.Logger] = []
+_listener: logging.handlers.QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any structured `extra=` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class ToolSampler(logging.Filter):
+    """Keep only a share of routine records per tool; never drops WARNING and above."""
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self.default_rate = rates.get("*", 1.0)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        tool = getattr(record, "tool", None)
+        if tool is None or record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(tool, self.default_rate)
+        return rate >= 1.0 or random.random() < rate
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that skips the eager format in prepare(), so %-formatting
+    (and JSON encoding) happens on the listener thread instead of the caller's.
+    The queue never leaves the process, so records need not be pickle-safe.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def parse_sample_rates(spec: str) -> dict[str, float]:
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = max(0.0, min(float(rate), 1.0))
+    return rates
+
+
+def get_trace_logger(name: str) -> logging.Logger:
+    """Logger for step-level traces; silent unless tracing is enabled."""
+    trace = logging.getLogger(f"{name}.trace")
+    if trace not in _trace_loggers:
+        _trace_loggers.append(trace)
+        trace.setLevel(logging.DEBUG if trace_enabled() else logging.INFO)
+    return trace
+
+
+def trace_enabled() -> bool:
+    return os.environ.get("MCP_LOG_TRACE", "0") == "1"
+
+
+def set_trace_enabled(enabled: bool) -> None:
+    """Switch step-level traces on or off for every trace logger."""
+    os.environ["MCP_LOG_TRACE"] = "1" if enabled else "0"
+    for trace in _trace_loggers:
+        trace.setLevel(logging.DEBUG if enabled else logging.INFO)
+    logging.getLogger("log-setup").warning("Step-level tracing %s", "enabled" if enabled else "disabled")
+
+
+def _toggle_trace(signum, frame) -> None:
+    set_trace_enabled(not trace_enabled())
+
+
+def _stop_listener() -> None:
+    """Flush and stop the background writer (also registered with atexit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(_stop_listener)
+
+
+def configure_logging(
+    level: str | None = None,
+    mode: str | None = None,
+    fmt: str | None = None,
+    sample: str | None = None,
+) -> None:
+    """Install the root handlers. Arguments override the MCP_LOG_* environment."""
+    global _listener
+
+    level = (level or os.environ.get("MCP_LOG_LEVEL", "INFO")).upper()
+    mode = mode or os.environ.get("MCP_LOG_MODE", "async")
+    fmt = fmt or os.environ.get("MCP_LOG_FORMAT", "text")
+    sample = sample if sample is not None else os.environ.get("MCP_LOG_SAMPLE", "")
+
+    # stderr only: stdout carries the MCP protocol for stdio servers
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    if mode == "async":
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        handler: logging.Handler = _DeferredQueueHandler(log_queue)
+        _stop_listener()
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+    else:
+        _stop_listener()
+        handler = output
+
+    rates = parse_sample_rates(sample)
+    if rates:
+        handler.addFilter(ToolSampler(rates))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    if hasattr(signal, "SIGUSR1"):
+        try:
+            signal.signal(signal.SIGUSR1, _toggle_trace)
+        except ValueError:
+            pass  # not in the main thread
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Event-Loop Watchdog
+
+Measures event-loop scheduling lag and catches blocking calls:
+- a heartbeat task sleeps for a fixed interval and records how late it woke
+  up as `event_loop_lag_seconds` (any lag is time every other client waited);
+- a watchdog thread checks the heartbeat, and when the loop has not run for
+  longer than the threshold it captures the loop thread's current stack and
+  logs it together with the tool call (name and arguments) that owns the
+  running task.
+
+Configured from the environment:
+    MCP_LOOP_LAG_THRESHOLD_MS  stall threshold in ms (default 100, 0 disables)
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Any
+
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+from metrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger("loop-watchdog")
+
+REGISTRY.describe("event_loop_lag_seconds", "Event loop scheduling lag.")
+REGISTRY.describe("event_loop_stalls_total", "Times the loop was blocked longer than the threshold.")
+
+MAX_ARGUMENT_CHARS = 200
+
+
+def _summarize_arguments(arguments: dict[str, Any] | None) -> str:
+    text = repr(arguments or {})
+    return text if len(text) <= MAX_ARGUMENT_CHARS else text[:MAX_ARGUMENT_CHARS] + "...}"
+
+
+class LoopWatchdog:
+    """Heartbeat task on the loop plus a monitor thread that reports stalls."""
+
+    def __init__(
+        self,
+        threshold: float = 0.1,
+        interval: float = 0.05,
+        registry: MetricsRegistry = REGISTRY,
+    ):
+        self.threshold = threshold
+        self.interval = interval
+        self.registry = registry
+        self.stalls = 0
+        # Tool calls in progress, keyed by the task running them
+        self.calls: dict[asyncio.Task, tuple[str, dict[str, Any] | None]] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: int | None = None
+        self._last_beat = time.monotonic()
+        self._reported_beat = 0.0
+        self._stop = threading.Event()
+        self._heartbeat: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    def start(self) -> None:
+        """Start monitoring the running loop (call from a coroutine on it)."""
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop = threading.Event()
+        self._heartbeat = self._loop.create_task(self._beat(), name="loop-watchdog-heartbeat")
+        threading.Thread(target=self._monitor, args=(self._stop,), name="loop-watchdog", daemon=True).start()
+        logger.info("Loop watchdog started (threshold %.0fms)", self.threshold * 1000)
+
+    def stop(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+        self._stop.set()
+        self._loop = None
+
+    async def _beat(self) -> None:
+        try:
+            while True:
+                expected = time.monotonic() + self.interval
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                lag = max(now - expected, 0.0)
+                self.registry.observe("event_loop_lag_seconds", lag)
+                if now - self._last_beat > self.interval + self.threshold:
+                    logger.warning("Event loop was blocked for %.0fms", (now - self._last_beat) * 1000)
+                self._last_beat = now
+        finally:
+            # Loop closing (or stop()): let the next loop that serves a request restart us
+            self._stop.set()
+            self._loop = None
+
+    def _monitor(self, stop: threading.Event) -> None:
+        while not stop.wait(self.interval):
+            beat = self._last_beat
+            blocked = time.monotonic() - beat
+            # Report each stall once, while it is still in progress
+            if blocked > self.interval + self.threshold and beat != self._reported_beat:
+                self._reported_beat = beat
+                self._report(blocked)
+
+    def _report(self, blocked: float) -> None:
+        self.stalls += 1
+        self.registry.inc("event_loop_stalls_total")
+        frame = sys._current_frames().get(self._loop_thread)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "<unavailable>\n"
+        del frame
+
+        task = asyncio.current_task(self._loop) if self._loop is not None else None
+        call = self.calls.get(task) if task is not None else None
+        if call is not None:
+            culprit = f"tool '{call[0]}' with arguments {_summarize_arguments(call[1])}"
+        elif self.calls:
+            in_flight = sorted({c[0] for c in list(self.calls.values())})
+            culprit = "unknown task; tool calls in flight: " + ", ".join(in_flight)
+        else:
+            culprit = "no tool call in flight"
+        logger.warning(
+            "Event loop blocked for %.0fms+ by %s\nLoop thread stack:\n%s",
+            blocked * 1000, culprit, stack.rstrip(),
+        )
+
+
+class WatchdogMiddleware(Middleware):
+    """Starts the watchdog with the first request and tracks which task runs which tool."""
+
+    def __init__(self, watchdog: LoopWatchdog):
+        self.watchdog = watchdog
+
+    async def on_request(self, context: MiddlewareContext, call_next):
+        if not self.watchdog.running:
+            self.watchdog.start()
+        return await call_next(context)
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        task = asyncio.current_task()
+        calls = self.watchdog.calls
+        calls[task] = (context.message.name, context.message.arguments)
+        try:
+            return await call_next(context)
+        finally:
+            calls.pop(task, None)
+
+
+_watchdog: LoopWatchdog | None = None
+
+
+def watch_loop(app, threshold: float | None = None) -> LoopWatchdog | None:
+    """
+    Attach the process-wide loop watchdog to an app; it starts with the first
+    MCP request. Every app in the process shares it, so a stall is attributed
+    to the right tool whichever server it belongs to.
+    """
+    global _watchdog
+    if _watchdog is None:
+        if threshold is None:
+            threshold = float(os.environ.get("MCP_LOOP_LAG_THRESHOLD_MS", "100")) / 1000
+        if threshold <= 0:
+            return None
+        _watchdog = LoopWatchdog(threshold)
+    app.add_middleware(WatchdogMiddleware(_watchdog))
+    return _watchdog
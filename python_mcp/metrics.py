@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Metrics
+
+Low-overhead instrumentation for the MCP servers:
+- per-tool call counters, error counters and an in-flight gauge;
+- HDR-style (log-linear) latency histograms: constant memory, ~6% relative
+  error per bucket, O(1) record cost;
+- upstream timings for outbound calls (geocoding, Open-Meteo, ...);
+- Prometheus text exposition on a /metrics HTTP route.
+
+Every tool is covered automatically by MetricsMiddleware; nothing has to be
+added to individual @app.tool functions. All updates happen on the event
+loop thread, so no locking is needed.
+"""
+
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Iterable
+
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+# Sub-buckets per power of two: 2 ** SUB_BUCKET_BITS (16 => ~6% bucket width)
+SUB_BUCKET_BITS = 4
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+
+class LatencyHistogram:
+    """Log-linear histogram of durations, recorded in microseconds."""
+
+    def __init__(self):
+        self.counts: dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    @staticmethod
+    def _index(micros: int) -> int:
+        if micros < 2 * _SUB_BUCKETS:
+            return micros
+        shift = micros.bit_length() - SUB_BUCKET_BITS - 1
+        return (shift + 1) * _SUB_BUCKETS + (micros >> shift) - _SUB_BUCKETS
+
+    @staticmethod
+    def _upper_bound(index: int) -> int:
+        if index < 2 * _SUB_BUCKETS:
+            return index
+        shift = index // _SUB_BUCKETS - 1
+        mantissa = index % _SUB_BUCKETS + _SUB_BUCKETS
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, seconds: float) -> None:
+        index = self._index(int(seconds * 1_000_000))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile, in seconds."""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._upper_bound(index) / 1_000_000, self.max)
+        return self.max
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: tuple[tuple[str, str], ...], extra: Iterable[tuple[str, str]] = ()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+class MetricsRegistry:
+    """Counters, gauges and latency histograms keyed by metric name and labels."""
+
+    def __init__(self, prefix: str = "mcp"):
+        self.prefix = prefix
+        self._counters: dict[str, dict[tuple, float]] = {}
+        self._gauges: dict[str, dict[tuple, float]] = {}
+        self._histograms: dict[str, dict[tuple, LatencyHistogram]] = {}
+        self._help: dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def inc(self, name: str, amount: float = 1.0, **labels: str) -> None:
+        series = self._counters.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0.0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        self._gauges.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+
+    def add_gauge(self, name: str, amount: float, **labels: str) -> None:
+        series = self._gauges.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0.0) + amount
+
+    def histogram(self, name: str, **labels: str) -> LatencyHistogram:
+        series = self._histograms.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        if key not in series:
+            series[key] = LatencyHistogram()
+        return series[key]
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        self.histogram(name, **labels).record(seconds)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Plain-data view of every series, e.g. for benchmarks and admin routes."""
+        return {
+            "counters": {n: {str(dict(k)): v for k, v in s.items()} for n, s in self._counters.items()},
+            "gauges": {n: {str(dict(k)): v for k, v in s.items()} for n, s in self._gauges.items()},
+            "histograms": {
+                n: {
+                    str(dict(k)): {
+                        "count": h.count,
+                        "sum": h.sum,
+                        **{f"p{int(q * 100)}": h.quantile(q) for q in QUANTILES},
+                    }
+                    for k, h in s.items()
+                }
+                for n, s in self._histograms.items()
+            },
+        }
+
+    def render(self) -> str:
+        """Prometheus text exposition format (histograms are exported as summaries)."""
+        lines = []
+
+        def header(name: str, kind: str) -> str:
+            full = f"{self.prefix}_{name}"
+            if name in self._help:
+                lines.append(f"# HELP {full} {self._help[name]}")
+            lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        for name, series in sorted(self._counters.items()):
+            full = header(name, "counter")
+            for labels, value in series.items():
+                lines.append(f"{full}{_labels(labels)} {value:g}")
+        for name, series in sorted(self._gauges.items()):
+            full = header(name, "gauge")
+            for labels, value in series.items():
+                lines.append(f"{full}{_labels(labels)} {value:g}")
+        for name, series in sorted(self._histograms.items()):
+            full = header(name, "summary")
+            for labels, hist in series.items():
+                for q in QUANTILES:
+                    lines.append(f"{full}{_labels(labels, [('quantile', str(q))])} {hist.quantile(q):.6f}")
+                lines.append(f"{full}_sum{_labels(labels)} {hist.sum:.6f}")
+                lines.append(f"{full}_count{_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("tool_calls_total", "Tool calls by tool and outcome.")
+REGISTRY.describe("tool_in_flight", "Tool calls currently executing.")
+REGISTRY.describe("tool_latency_seconds", "Tool call latency.")
+REGISTRY.describe("upstream_requests_total", "Outbound requests by target and outcome.")
+REGISTRY.describe("upstream_latency_seconds", "Outbound request latency.")
+
+
+def is_error_result(result: Any) -> bool:
+    """
+    Tools in this repo usually report failures in-band ("Error: ..." text or an
+    {"error": ...} dict) rather than raising, so check for those too.
+    """
+    if getattr(result, "is_error", False):
+        return True
+    structured = getattr(result, "structured_content", None)
+    if isinstance(structured, dict) and "error" in structured:
+        return True
+    content = getattr(result, "content", None)
+    if content:
+        text = getattr(content[0], "text", "")
+        return isinstance(text, str) and text.startswith("Error")
+    return False
+
+
+class MetricsMiddleware(Middleware):
+    """Times every tool call and counts outcomes, for all registered tools."""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY):
+        self.registry = registry
+        # Names seen to be registered tools; bounded by the tools the server has
+        self._known: set[str] = set()
+
+    async def _label(self, context: MiddlewareContext) -> str:
+        """The tool's name, or "unknown": the name comes from the client, and each one
+        would otherwise get its own label set (and histogram) on /metrics."""
+        name = context.message.name
+        if name in self._known:
+            return name
+        server = getattr(context.fastmcp_context, "fastmcp", None)
+        if server is not None and await server.get_tool(name) is None:
+            return "unknown"
+        self._known.add(name)
+        return name
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        tool = await self._label(context)
+        registry = self.registry
+        registry.add_gauge("tool_in_flight", 1, tool=tool)
+        status = "ok"
+        start = time.perf_counter()
+        try:
+            result = await call_next(context)
+            if is_error_result(result):
+                status = "error"
+            return result
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            registry.observe("tool_latency_seconds", time.perf_counter() - start, tool=tool)
+            registry.inc("tool_calls_total", tool=tool, status=status)
+            registry.add_gauge("tool_in_flight", -1, tool=tool)
+
+
+@asynccontextmanager
+async def upstream_timer(target: str, registry: MetricsRegistry = REGISTRY) -> AsyncIterator[None]:
+    """Record latency and outcome of one outbound call to `target`."""
+    status = "ok"
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        registry.observe("upstream_latency_seconds", time.perf_counter() - start, target=target)
+        registry.inc("upstream_requests_total", target=target, status=status)
+
+
+def instrument(app, registry: MetricsRegistry = REGISTRY) -> None:
+    """Attach the metrics middleware and expose GET /metrics on the HTTP transports."""
+    app.add_middleware(MetricsMiddleware(registry))
+
+    @app.custom_route("/metrics", methods=["GET"])
+    async def metrics_endpoint(request: Request) -> PlainTextResponse:
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
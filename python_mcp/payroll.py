@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Bulk Payroll Engine
+
+Computes monthly payslips for a whole population at once. Compensation
+columns are loaded into NumPy arrays and tax brackets, deductions and
+allowances are applied as vectorised operations, so a run over tens of
+thousands of employees is a handful of array passes rather than a
+per-employee loop. Finished runs are kept in a small bounded store and
+read back as paginated payslip summaries.
+"""
+
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the payroll tools report it as missing
+    np = None
+
+# Progressive annual income-tax brackets: (lower bound, marginal rate)
+TAX_BRACKETS: list[tuple[float, float]] = [
+    (0.0, 0.00),
+    (12_000.0, 0.10),
+    (40_000.0, 0.20),
+    (100_000.0, 0.30),
+    (200_000.0, 0.40),
+]
+
+# Below this many employees a single partition is always used
+MIN_PARTITION_SIZE = 20_000
+
+
+def require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("NumPy is not installed; run `pip install numpy` to enable payroll tools")
+
+
+def compute_payslips(
+    salary: "np.ndarray",
+    allowances: "np.ndarray",
+    deductions: "np.ndarray",
+    brackets: list[tuple[float, float]] = TAX_BRACKETS,
+) -> dict[str, "np.ndarray"]:
+    """
+    Vectorised monthly payslips from annual salary, allowances and pre-tax deductions.
+    Top-level so it can also run in a worker process on one partition.
+    """
+    lower = np.array([b[0] for b in brackets])
+    upper = np.append(lower[1:], np.inf)
+    rates = np.array([b[1] for b in brackets])
+
+    annual_gross = salary + allowances
+    taxable = np.maximum(annual_gross - deductions, 0.0)
+    # (employees x brackets): the slice of income that falls in each bracket
+    in_bracket = np.clip(taxable[:, None] - lower, 0.0, upper - lower)
+    annual_tax = in_bracket @ rates
+
+    gross = annual_gross / 12
+    tax = annual_tax / 12
+    deduction = deductions / 12
+    return {
+        "gross": np.round(gross, 2),
+        "deductions": np.round(deduction, 2),
+        "tax": np.round(tax, 2),
+        "net": np.round(gross - deduction - tax, 2),
+    }
+
+
+def partition(columns: dict[str, "np.ndarray"], partitions: int) -> list[tuple["np.ndarray", ...]]:
+    """Split the compensation columns into roughly equal contiguous partitions."""
+    size = len(columns["salary"])
+    partitions = max(1, min(partitions, size // MIN_PARTITION_SIZE or 1))
+    bounds = np.linspace(0, size, partitions + 1, dtype=int)
+    return [
+        (
+            columns["salary"][start:end],
+            columns["allowances"][start:end],
+            columns["deductions"][start:end],
+        )
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+
+
+def totals(payslips: dict[str, "np.ndarray"]) -> dict[str, float]:
+    """Gross, tax, deduction and net totals over some payslips."""
+    return {
+        "total_gross": round(float(payslips["gross"].sum()), 2),
+        "total_tax": round(float(payslips["tax"].sum()), 2),
+        "total_deductions": round(float(payslips["deductions"].sum()), 2),
+        "total_net": round(float(payslips["net"].sum()), 2),
+    }
+
+
+def combine(parts: list[dict[str, "np.ndarray"]]) -> dict[str, "np.ndarray"]:
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+def to_arrays(columns: dict[str, list]) -> dict[str, "np.ndarray"]:
+    """Convert the store's column lists into arrays for computation."""
+    require_numpy()
+    return {
+        "salary": np.asarray(columns["salary"], dtype=np.float64),
+        "allowances": np.asarray(columns["allowances"], dtype=np.float64),
+        "deductions": np.asarray(columns["deductions"], dtype=np.float64),
+    }
+
+
+class PayrollRuns:
+    """Completed payroll runs, oldest evicted first once `max_runs` is reached."""
+
+    def __init__(self, max_runs: int = 8):
+        self.max_runs = max_runs
+        self._runs: OrderedDict[str, dict[str, Any]] = OrderedDict()
+
+    def add(self, period: str, columns: dict[str, list], payslips: dict[str, "np.ndarray"]) -> dict[str, Any]:
+        run_id = uuid.uuid4().hex
+        run = {
+            "run_id": run_id,
+            "period": period,
+            "created_at": time.time(),
+            "employee_id": columns["employee_id"],
+            "name": columns["name"],
+            "department": columns["department"],
+            **payslips,
+        }
+        self._runs[run_id] = run
+        while len(self._runs) > self.max_runs:
+            self._runs.popitem(last=False)
+        return run
+
+    def get(self, run_id: str) -> dict[str, Any]:
+        if run_id not in self._runs:
+            raise ValueError(f"Unknown or expired run_id '{run_id}'")
+        self._runs.move_to_end(run_id)
+        return self._runs[run_id]
+
+    @staticmethod
+    def summary(run: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "run_id": run["run_id"],
+            "period": run["period"],
+            "employees": len(run["employee_id"]),
+            **totals(run),
+        }
+
+    @staticmethod
+    def page(run: dict[str, Any], cursor: int = 0, limit: int = 100) -> dict[str, Any]:
+        """Payslip summaries [cursor, cursor + limit). Runs are immutable, so offsets are stable."""
+        end = min(cursor + limit, len(run["employee_id"]))
+        fields = ("employee_id", "name", "department", "gross", "deductions", "tax", "net")
+        # Slice every column once; tolist() converts NumPy scalars in bulk
+        sliced = [
+            run[field][cursor:end].tolist() if field in ("gross", "deductions", "tax", "net")
+            else run[field][cursor:end]
+            for field in fields
+        ]
+        payslips = [dict(zip(fields, values)) for values in zip(*sliced)]
+        return {
+            "run_id": run["run_id"],
+            "payslips": payslips,
+            "next_cursor": end if end < len(run["employee_id"]) else None,
+        }
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Profiling
+
+On-demand, time-bounded profiling of a live server through admin HTTP routes:
+
+    GET /admin/profile/cpu?seconds=10&interval_ms=5
+        Statistical CPU profile of the event loop thread, in collapsed-stack
+        format (one "frame;frame;frame count" line per stack), ready for
+        flamegraph.pl or speedscope.
+    GET /admin/profile/memory?seconds=10&top=25
+        tracemalloc allocation diff between the start and end of the window.
+    GET /admin/profile/tasks
+        Every asyncio task with its current await stack.
+
+The routes are only registered when MCP_ADMIN_TOKEN is set, and callers must
+send `Authorization: Bearer <token>`. Nothing runs between sessions: the CPU
+sampler is a short-lived thread reading the loop thread's frame (the loop
+itself is never interrupted), and tracemalloc is switched on only for the
+duration of a memory session. One session runs at a time.
+"""
+
+import asyncio
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from types import FrameType
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+
+logger = logging.getLogger("profiling")
+
+ADMIN_TOKEN_ENV = "MCP_ADMIN_TOKEN"
+MAX_SECONDS = 60.0
+MIN_INTERVAL = 0.001
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame: FrameType | None) -> str:
+    """Root-first, semicolon-separated frames of one stack."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a separate thread at a fixed interval."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = max(interval, MIN_INTERVAL)
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+
+    def run(self, duration: float) -> None:
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse_stack(frame)] += 1
+                self.samples += 1
+            del frame
+            time.sleep(self.interval)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+async def profile_cpu(seconds: float, interval: float = 0.005) -> StackSampler:
+    """Sample the calling (event loop) thread for `seconds` without blocking the loop."""
+    sampler = StackSampler(threading.get_ident(), interval)
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+
+    def run() -> None:
+        try:
+            sampler.run(seconds)
+        finally:
+            loop.call_soon_threadsafe(done.set_result, None)
+
+    # A dedicated thread, so a busy default executor cannot delay the session
+    threading.Thread(target=run, name="cpu-profiler", daemon=True).start()
+    await done
+    return sampler
+
+
+async def profile_memory(seconds: float, top: int = 25, frames: int = 1) -> list[str]:
+    """Allocation growth over `seconds`, grouped by source line, largest first."""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(frames)
+    try:
+        before = tracemalloc.take_snapshot()
+        await asyncio.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started:
+            tracemalloc.stop()
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ]
+    stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+    return [str(stat) for stat in stats[:top]]
+
+
+def dump_tasks(limit: int = 20) -> list[dict]:
+    """Every task on the running loop with its coroutine and current await stack."""
+    tasks = []
+    for task in asyncio.all_tasks():
+        coro = task.get_coro()
+        tasks.append({
+            "name": task.get_name(),
+            "coroutine": getattr(coro, "__qualname__", repr(coro)),
+            "done": task.done(),
+            "stack": [
+                f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})"
+                for frame in task.get_stack(limit=limit)
+            ],
+        })
+    return sorted(tasks, key=lambda t: t["name"])
+
+
+def _authorized(request: Request, token: str) -> bool:
+    supplied = request.headers.get("authorization", "")
+    scheme, _, value = supplied.partition(" ")
+    # Compared as bytes: compare_digest rejects str holding non-ASCII characters
+    return scheme.lower() == "bearer" and hmac.compare_digest(value.strip().encode(), token.encode())
+
+
+def _seconds(request: Request, default: float = 10.0) -> float:
+    return max(0.1, min(float(request.query_params.get("seconds", default)), MAX_SECONDS))
+
+
+def enable_profiling(app, token: str | None = None) -> bool:
+    """Register the admin profiling routes if an admin token is configured."""
+    token = token or os.environ.get(ADMIN_TOKEN_ENV, "")
+    if not token:
+        return False
+    session = asyncio.Lock()
+
+    def guard(request: Request):
+        if not _authorized(request, token):
+            return JSONResponse({"error": "unauthorized"}, status_code=401)
+        if session.locked():
+            return JSONResponse({"error": "a profiling session is already running"}, status_code=409)
+        return None
+
+    @app.custom_route("/admin/profile/cpu", methods=["GET"])
+    async def cpu_profile(request: Request):
+        if (denied := guard(request)) is not None:
+            return denied
+        try:
+            seconds = _seconds(request)
+            interval = float(request.query_params.get("interval_ms", 5)) / 1000
+        except ValueError as e:
+            return JSONResponse({"error": f"Invalid parameter: {e}"}, status_code=400)
+        async with session:
+            logger.warning("CPU profile started for %.1fs", seconds)
+            sampler = await profile_cpu(seconds, interval)
+        return PlainTextResponse(
+            sampler.collapsed(), headers={"X-Profile-Samples": str(sampler.samples)}
+        )
+
+    @app.custom_route("/admin/profile/memory", methods=["GET"])
+    async def memory_profile(request: Request):
+        if (denied := guard(request)) is not None:
+            return denied
+        try:
+            seconds = _seconds(request)
+            top = max(1, min(int(request.query_params.get("top", 25)), 500))
+        except ValueError as e:
+            return JSONResponse({"error": f"Invalid parameter: {e}"}, status_code=400)
+        async with session:
+            logger.warning("Allocation profile started for %.1fs", seconds)
+            lines = await profile_memory(seconds, top)
+        return PlainTextResponse("\n".join(lines) + "\n")
+
+    @app.custom_route("/admin/profile/tasks", methods=["GET"])
+    async def task_profile(request: Request):
+        if not _authorized(request, token):
+            return JSONResponse({"error": "unauthorized"}, status_code=401)
+        return JSONResponse({"tasks": dump_tasks()})
+
+    logger.info("Admin profiling routes enabled under /admin/profile")
+    return True
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Progress Notifications
+
+Lets a long-running tool report progress and partial results while it works,
+as MCP progress notifications: `progress` / `total` for a progress bar, and a
+`message` saying what is happening or carrying the next piece of the result:
+what a forecast is fetching (its one upstream request has no smaller piece);
+each payroll partition's totals as it completes, and the employees of each
+chunk of a batch lookup, as JSON. The final tool result is unchanged, so
+clients that ignore progress see no difference.
+
+- Bare progress updates are throttled to one per MIN_INTERVAL; updates that
+  carry a message, and the final one, are always sent.
+- Sending is best effort: a client that has gone away does not fail the call.
+
+Progress reaches clients over stdio, SSE, and streamable HTTP with streamed
+responses (MCP_JSON_RESPONSE=0). A streamable-HTTP call answered with plain
+JSON gets only the final result.
+"""
+
+import logging
+import time
+
+from fastmcp import Context
+
+logger = logging.getLogger("progress")
+
+# Shortest gap between two bare progress updates, in seconds
+MIN_INTERVAL = 0.1
+
+
+class Progress:
+    """Progress notifications for one tool call; does nothing without a context."""
+
+    def __init__(self, ctx: Context | None, total: float | None = None, min_interval: float = MIN_INTERVAL):
+        self.ctx = ctx
+        self.total = total
+        self.done = 0.0
+        self.min_interval = min_interval
+        self._last_sent = float("-inf")
+
+    async def update(self, done: float, message: str | None = None) -> None:
+        """Report `done` units of work, and optionally the next piece of the result."""
+        self.done = done
+        if self.ctx is None:
+            return
+        now = time.monotonic()
+        final = self.total is not None and done >= self.total
+        if message is None and not final and now - self._last_sent < self.min_interval:
+            return
+        self._last_sent = now
+        try:
+            await self.ctx.report_progress(done, self.total, message)
+        except Exception as e:
+            logger.debug("Progress notification failed; sending no more for this call: %s", e)
+            self.ctx = None
+
+    async def advance(self, message: str | None = None, amount: float = 1.0) -> None:
+        """Report `amount` more units of work done."""
+        await self.update(self.done + amount, message)
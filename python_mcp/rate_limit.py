@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Rate Limiting
+
+Per-client token buckets, so one runaway agent loop is throttled on its own
+instead of slowing everyone down or spending the shared upstream budget.
+
+- A client is its API key (`Authorization: Bearer <key>` or `X-API-Key`),
+  shared by all of its sessions, or else its MCP session; sessionless
+  streamable HTTP clients without a key are told apart by address. The
+  client of a stdio (or in-process) server is its only one and is not limited.
+- Every tool call spends tokens; the cost is per tool, so a forecast that
+  goes upstream costs more than `add`. A tool that ends up not going
+  upstream (answered from a cache) lowers its own charge with charge_only().
+  Buckets refill at a steady rate up to a burst size.
+- A call that cannot pay is rejected with an error result carrying
+  `retry_after`, the seconds until the bucket holds enough tokens.
+- Buckets live in one LRU table. A bucket left idle long enough to refill
+  completely is indistinguishable from a new one, so it is evicted; the
+  table is also capped in size.
+- Buckets are per process. Under workers.py each worker refills at the rate
+  divided by MCP_WORKER_COUNT, so a client whose sessions are spread across
+  the workers gets the configured rate in total; the burst is per worker.
+
+Reported on /metrics as mcp_rate_limited_total and mcp_rate_limit_clients.
+
+Configured from the environment:
+    MCP_RATE_LIMIT        tokens per second per client, across all workers (default 10; 0 disables)
+    MCP_RATE_BURST        bucket size, per worker (default 60)
+    MCP_RATE_COSTS        per-tool costs, e.g. "get-forecast=10,add=1"
+                          (added to, and overriding, the server's defaults; others cost 1)
+    MCP_RATE_MAX_CLIENTS  buckets kept at most (default 100000)
+"""
+
+import contextvars
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from fastmcp.server.dependencies import get_http_headers, get_http_request
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from fastmcp.tools import ToolResult
+
+from admission import parse_limits
+from metrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger("rate-limit")
+
+REGISTRY.describe("rate_limited_total", "Tool calls rejected by the per-client rate limit.")
+REGISTRY.describe("rate_limit_clients", "Clients with a partly spent token bucket.")
+
+# The current tool call's charge: (limiter, client, tokens spent)
+_charge: contextvars.ContextVar[tuple["RateLimiter", str, float] | None] = contextvars.ContextVar(
+    "rate_limit_charge", default=None
+)
+
+
+class Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    """Token buckets keyed by client, in an LRU table with idle eviction."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        max_clients: int = 100_000,
+        clock=time.monotonic,
+        registry: MetricsRegistry = REGISTRY,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        # Idle this long, a bucket is full again: same as a fresh one
+        self.idle_timeout = burst / rate
+        self.clock = clock
+        self.registry = registry
+        self._buckets: OrderedDict[str, Bucket] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _evict(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            key, bucket = next(iter(buckets.items()))
+            if now - bucket.updated < self.idle_timeout and len(buckets) <= self.max_clients:
+                break
+            del buckets[key]
+
+    def take(self, key: str, cost: float) -> float:
+        """Spend `cost` tokens; 0.0 if allowed, else seconds until it would be."""
+        now = self.clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = Bucket(self.burst, now)
+        else:
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+            self._buckets.move_to_end(key)
+        self._evict(now)
+        # A call costing more than the burst could never run; charge it a full bucket
+        cost = min(cost, self.burst)
+        if bucket.tokens >= cost:
+            bucket.tokens -= cost
+            wait = 0.0
+        else:
+            wait = (cost - bucket.tokens) / self.rate
+        self.registry.set_gauge("rate_limit_clients", len(self._buckets))
+        return wait
+
+    def refund(self, key: str, amount: float) -> None:
+        """Give back tokens for a call that turned out cheaper than charged."""
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.tokens = min(self.burst, bucket.tokens + amount)
+
+
+def charge_only(cost: float) -> None:
+    """Lower the current tool call's charge to `cost`, e.g. when it was answered from a cache."""
+    charge = _charge.get()
+    if charge is None:
+        return
+    limiter, key, charged = charge
+    if charged > cost:
+        limiter.refund(key, charged - cost)
+        _charge.set((limiter, key, cost))
+
+
+def client_key() -> str:
+    """The API key (hashed) if the request carries one, else the MCP session or peer address."""
+    headers = get_http_headers(include={"authorization", "mcp-session-id"})
+    api_key = headers.get("x-api-key", "")
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if not api_key and scheme.lower() == "bearer":
+        api_key = token.strip()
+    if api_key:
+        # Never keep raw credentials in the table
+        return "key:" + hashlib.blake2b(api_key.encode(), digest_size=12).hexdigest()
+    try:
+        request = get_http_request()
+    except RuntimeError:
+        # stdio or in-process: a single client
+        return "local"
+    # The transport's own session id: a header for streamable HTTP, the POST
+    # URL's query string for SSE
+    session = headers.get("mcp-session-id") or request.query_params.get("session_id")
+    if session:
+        return "session:" + session
+    # Sessionless streamable HTTP: the best identity left is the peer address
+    return "addr:" + (request.client.host if request.client else "unknown")
+
+
+def rate_limited_result(tool: str, cost: float, retry_after: float) -> ToolResult:
+    retry_after = round(retry_after, 2)
+    return ToolResult(
+        content=f"Error: Rate limit exceeded for {tool}, retry after {retry_after:g}s",
+        structured_content={"error": "rate_limited", "tool": tool, "cost": cost, "retry_after": retry_after},
+        is_error=True,
+    )
+
+
+class RateLimitMiddleware(Middleware):
+    """Charges each tool call to its client's bucket before it runs."""
+
+    def __init__(self, limiter: RateLimiter, costs: dict[str, float]):
+        self.limiter = limiter
+        self.costs = costs
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        tool = context.message.name
+        cost = self.costs.get(tool, 1)
+        key = client_key()
+        if key == "local":
+            return await call_next(context)
+        retry_after = self.limiter.take(key, cost)
+        if retry_after > 0:
+            self.limiter.registry.inc("rate_limited_total", tool=tool)
+            logger.info("Rate limited %s (cost %g), retry after %.2fs", tool, cost, retry_after, extra={"tool": tool})
+            return rate_limited_result(tool, cost, retry_after)
+        token = _charge.set((self.limiter, key, min(cost, self.limiter.burst)))
+        try:
+            return await call_next(context)
+        finally:
+            _charge.reset(token)
+
+
+def rate_limit(app, costs: dict[str, float] | None = None) -> RateLimitMiddleware | None:
+    """Attach per-client rate limiting to an app; `costs` are defaults the environment can override."""
+    rate = float(os.environ.get("MCP_RATE_LIMIT", "10"))
+    if rate <= 0:
+        return None
+    limiter = RateLimiter(
+        rate / int(os.environ.get("MCP_WORKER_COUNT", "1")),
+        float(os.environ.get("MCP_RATE_BURST", "60")),
+        int(os.environ.get("MCP_RATE_MAX_CLIENTS", "100000")),
+    )
+    middleware = RateLimitMiddleware(limiter, {**(costs or {}), **parse_limits(os.environ.get("MCP_RATE_COSTS", ""))})
+    app.add_middleware(middleware)
+    return middleware
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Response Writes
+
+Shapes how HTTP response bodies reach the socket, for slow remote clients and
+bursts of small messages:
+
+- Coalescing: on a streamed response (SSE events, progress notifications),
+  a message arriving on an idle stream is written at once, but messages that
+  follow within a short window of the last write are buffered and written
+  together, so a burst costs a few writes instead of one each. A buffer
+  reaching the flush size is written at once; the end of a response is never
+  delayed.
+- Compression: a client sending `Accept-Encoding: gzip` gets gzip-encoded
+  JSON and text responses above a minimum size, and gzip-encoded event
+  streams. A stream is sync-flushed at every write, so each event can be
+  decoded as soon as it arrives.
+- Chunking: every write is at most the chunk size, so a large result (a
+  16-day forecast, bulk statistics) is handed to the server in pieces and
+  each piece waits for the socket to drain before the next.
+
+Reported on /metrics as mcp_response_messages_total (body messages from the
+app), mcp_response_writes_total (writes to the server) and
+mcp_response_bytes_total (by stage: app or wire).
+
+Configured from the environment:
+    MCP_COALESCE_MS        the coalescing window for streamed responses (default 2; 0 disables)
+    MCP_COALESCE_BYTES     buffered bytes that are written without waiting (default 16384)
+    MCP_GZIP_MIN_BYTES     smallest single response body to compress (default 1024; 0 disables gzip)
+    MCP_WRITE_CHUNK_BYTES  largest single write (default 65536)
+"""
+
+import asyncio
+import gzip
+import os
+import zlib
+
+from metrics import REGISTRY, MetricsRegistry
+
+REGISTRY.describe("response_messages_total", "HTTP response body messages produced by the app.")
+REGISTRY.describe("response_writes_total", "HTTP response body writes handed to the server.")
+REGISTRY.describe("response_bytes_total", "HTTP response body bytes, as produced (app) and as written (wire).")
+
+GZIP_LEVEL = 6
+# wbits for a gzip container (header and trailer) around deflate data
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def _header(headers, name: bytes) -> bytes:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return b""
+
+
+def accepts_gzip(headers) -> bool:
+    """Whether an Accept-Encoding header allows gzip (and does not give it q=0)."""
+    for item in _header(headers, b"accept-encoding").decode("latin-1").split(","):
+        coding, _, params = item.partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            quality = params.strip().lower()
+            if not quality.startswith("q="):
+                return True
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+    return False
+
+
+def _compressible(content_type: bytes) -> bool:
+    return content_type.startswith(b"text/") or b"json" in content_type
+
+
+def _gzip_headers(headers, length: int | None = None) -> list:
+    kept = [(k, v) for k, v in headers if k.lower() not in (b"content-length", b"content-encoding", b"vary")]
+    vary = _header(headers, b"vary")
+    kept.append((b"content-encoding", b"gzip"))
+    kept.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+    if length is not None:
+        kept.append((b"content-length", str(length).encode()))
+    return kept
+
+
+class _Response:
+    """One response in flight: the wrapped `send` for the app."""
+
+    def __init__(self, shaping: "ResponseWrites", send, gzip_ok: bool):
+        self.shaping = shaping
+        self._send = send
+        self.gzip_ok = gzip_ok
+        self.held_start: dict | None = None
+        self.compress = False
+        self.compressor = None
+        self.buffer = bytearray()
+        self.buffered_in = 0
+        self.timer: asyncio.Task | None = None
+        self.last_write = float("-inf")
+        self.lock = asyncio.Lock()
+        self.error: BaseException | None = None
+
+    async def _write(self, data: bytes, more_body: bool) -> None:
+        """Hand `data` to the server in chunks of at most the chunk size."""
+        chunk = self.shaping.chunk_bytes
+        registry = self.shaping.registry
+        for offset in range(0, max(len(data), 1), chunk):
+            piece = data[offset:offset + chunk]
+            last = offset + chunk >= len(data)
+            await self._send({"type": "http.response.body", "body": piece, "more_body": more_body or not last})
+            registry.inc("response_writes_total")
+            registry.inc("response_bytes_total", len(piece), stage="wire")
+
+    async def flush(self, final: bool = False) -> None:
+        async with self.lock:
+            if self.timer is not None and self.timer is not asyncio.current_task():
+                self.timer.cancel()
+            self.timer = None
+            if self.compressor is not None:
+                self.buffer += self.compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+            data, self.buffer, self.buffered_in = bytes(self.buffer), bytearray(), 0
+            if data or final:
+                await self._write(data, more_body=not final)
+                self.last_write = asyncio.get_running_loop().time()
+
+    async def _flush_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        try:
+            await self.flush()
+        except Exception as e:
+            # The app sees it on its next send (usually: the client went away)
+            self.error = e
+
+    async def _start(self, message: dict, length: int | None = None) -> None:
+        headers = message.get("headers", [])
+        if self.compress:
+            headers = _gzip_headers(headers, length)
+        await self._send({**message, "headers": headers})
+
+    async def __call__(self, message: dict) -> None:
+        if self.error is not None:
+            raise self.error
+        kind = message["type"]
+        if kind == "http.response.start":
+            headers = message.get("headers", [])
+            content_type = _header(headers, b"content-type").lower()
+            self.compress = (
+                self.gzip_ok
+                and not _header(headers, b"content-encoding")
+                and message.get("status", 200) not in (204, 304)
+                and _compressible(content_type)
+            )
+            if content_type.startswith(b"text/event-stream"):
+                # Streams start at once: clients wait for the headers
+                if self.compress:
+                    self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, GZIP_WBITS)
+                await self._start(message)
+            else:
+                self.held_start = message
+            return
+        if kind != "http.response.body":
+            await self.flush()
+            return await self._send(message)
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        self.shaping.registry.inc("response_messages_total")
+        self.shaping.registry.inc("response_bytes_total", len(body), stage="app")
+
+        if self.held_start is not None:
+            start, self.held_start = self.held_start, None
+            if not more_body:
+                # The whole body at once: compress it if it is worth it
+                self.compress = self.compress and len(body) >= self.shaping.gzip_min_bytes
+                if self.compress:
+                    body = gzip.compress(body, GZIP_LEVEL, mtime=0)
+                await self._start(start, len(body) if self.compress else None)
+                async with self.lock:
+                    await self._write(body, more_body=False)
+                return
+            if self.compress:
+                self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, GZIP_WBITS)
+            await self._start(start)
+
+        self.buffer += self.compressor.compress(body) if self.compressor is not None else body
+        self.buffered_in += len(body)
+        if not more_body:
+            await self.flush(final=True)
+        elif self.buffered_in >= self.shaping.flush_bytes:
+            await self.flush()
+        elif self.timer is None:
+            delay = self.last_write + self.shaping.window - asyncio.get_running_loop().time()
+            if delay <= 0:
+                # Idle stream: nothing to wait for
+                await self.flush()
+            else:
+                self.timer = asyncio.ensure_future(self._flush_later(delay))
+
+    def close(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+
+
+class ResponseWrites:
+    """ASGI wrapper coalescing, compressing and chunking response bodies."""
+
+    def __init__(
+        self,
+        app,
+        window: float = 0.002,
+        flush_bytes: int = 16384,
+        gzip_min_bytes: int = 1024,
+        chunk_bytes: int = 65536,
+        registry: MetricsRegistry = REGISTRY,
+    ):
+        self.app = app
+        self.window = window
+        self.flush_bytes = flush_bytes
+        self.gzip_min_bytes = gzip_min_bytes
+        self.chunk_bytes = max(1, chunk_bytes)
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        gzip_ok = self.gzip_min_bytes > 0 and scope["method"] != "HEAD" and accepts_gzip(scope["headers"])
+        response = _Response(self, send, gzip_ok)
+        try:
+            await self.app(scope, receive, response)
+        finally:
+            response.close()
+
+
+def shape_writes(asgi_app) -> ResponseWrites:
+    """Wrap an ASGI app with response shaping configured from the environment."""
+    return ResponseWrites(
+        asgi_app,
+        window=float(os.environ.get("MCP_COALESCE_MS", "2")) / 1000,
+        flush_bytes=int(os.environ.get("MCP_COALESCE_BYTES", "16384")),
+        gzip_min_bytes=int(os.environ.get("MCP_GZIP_MIN_BYTES", "1024")),
+        chunk_bytes=int(os.environ.get("MCP_WRITE_CHUNK_BYTES", "65536")),
+    )
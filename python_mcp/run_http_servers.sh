@@ -9,8 +9,18 @@ source env/bin/activate
 echo "Starting MCP HTTP Servers..."
 echo "================================"
 
+# MCP_WORKERS > 1 runs each server as several workers sharing its port
+WORKERS=${MCP_WORKERS:-1}
+serve() {
+    if [ "$WORKERS" -gt 1 ]; then
+        python workers.py "$1" --workers "$WORKERS" &
+    else
+        python "$1" &
+    fi
+}
+
 # Start calculator server in background
-python calculator_server_http.py &
+serve calculator_server_http.py
 CALC_PID=$!
 echo "✓ Calculator Server started (PID: $CALC_PID)"
 echo "  URL: http://localhost:8000/sse"
@@ -19,7 +29,7 @@ echo "  URL: http://localhost:8000/sse"
 sleep 1
 
 # Start weather server in background
-python weather_server_http.py &
+serve weather_server_http.py
 WEATHER_PID=$!
 echo "✓ Weather Server started (PID: $WEATHER_PID)"
 echo "  URL: http://localhost:8001/sse"
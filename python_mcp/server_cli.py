@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Server Command Line
+
+One entry point for every server module (calculator_server.py,
+weather_server.py): which transports to serve, plus the usual settings, from
+command-line flags or a config file instead of only the environment.
+
+    python weather_server.py                                   # stdio, as before
+    python weather_server.py --transport sse --port 8001
+    python weather_server.py --transport stdio,streamable-http --cache-ttl 600
+    python weather_server.py --config weather.env
+
+- Flags and config entries are applied to the environment settings each
+  module already reads (MCP_PORT, MCP_WEATHER_CACHE_TTL, ...), before the
+  server module configures itself. A flag overrides the environment, which
+  overrides the config file: a file of NAME=VALUE lines, with # comments.
+- `--transport` takes a comma-separated list: stdio, plus at most one of sse
+  and streamable-http. Every transport is served by the same process and
+  app, so stdio and HTTP clients share its caches, connection pools and
+  limits. The process stops when any transport stops, e.g. when the client
+  that started it over stdio closes stdin.
+- A server module run directly (by a desktop client, say) serves stdio
+  unless its command line or config file names another transport. An
+  MCP_TRANSPORT exported for the *_http.py scripts is ignored there, so it
+  cannot silently turn a stdio launch into a network listener.
+- Worker processes (workers.py) serve HTTP only.
+
+The *_http.py scripts are this entry point with HTTP as the default transport.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+
+from http_serving import HttpSettings, TRANSPORTS, run_until_complete, serve
+
+logger = logging.getLogger("server-cli")
+
+# Flag destination -> the environment setting it stands for
+FLAG_SETTINGS = {
+    "transport": "MCP_TRANSPORT",
+    "host": "MCP_HOST",
+    "port": "MCP_PORT",
+    "path": "MCP_PATH",
+    "json_response": "MCP_JSON_RESPONSE",
+    "stateless": "MCP_STATELESS",
+    "loop": "MCP_LOOP",
+    "max_concurrency": "MCP_MAX_CONCURRENCY",
+    "rate_limit": "MCP_RATE_LIMIT",
+    "upstream_connections": "MCP_HTTP_MAX_CONNECTIONS",
+    "compute_workers": "MCP_COMPUTE_WORKERS",
+    "cache_ttl": "MCP_WEATHER_CACHE_TTL",
+    "cache_entries": "MCP_STALE_MAX_ENTRIES",
+    "hot_locations": "MCP_HOT_LOCATIONS_FILE",
+    "log_level": "MCP_LOG_LEVEL",
+}
+
+
+def parse_transports(value: str) -> list[str]:
+    """The transports named in a comma-separated list, validated."""
+    transports = []
+    for name in (part.strip().lower() for part in value.split(",")):
+        if not name:
+            continue
+        if name == "http":
+            name = "streamable-http"
+        if name != "stdio" and name not in TRANSPORTS:
+            raise ValueError(f"Unknown transport '{name}' (expected stdio, {', '.join(TRANSPORTS)})")
+        if name not in transports:
+            transports.append(name)
+    if len([name for name in transports if name != "stdio"]) > 1:
+        raise ValueError("At most one HTTP transport per process (sse or streamable-http)")
+    return transports or ["stdio"]
+
+
+def load_config(path: str) -> dict[str, str]:
+    """NAME=VALUE lines from a config file; blank lines and # comments are skipped."""
+    settings = {}
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            name, sep, value = line.partition("=")
+            if not sep or not name.strip():
+                raise ValueError(f"{path}:{number}: expected NAME=VALUE")
+            settings[name.strip()] = value.strip().strip("\"'")
+    return settings
+
+
+def build_parser(default_transport: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Run an MCP server. Every flag stands for the environment setting shown.",
+    )
+    parser.add_argument("--config", metavar="FILE", help="NAME=VALUE environment settings to start from")
+    parser.add_argument(
+        "--transport",
+        help=(
+            f"comma-separated: stdio, sse, streamable-http (default {default_transport}"
+            + (")" if default_transport == "stdio" else ", or MCP_TRANSPORT)")
+        ),
+    )
+    parser.add_argument("--host", help="HTTP bind address (MCP_HOST; default 127.0.0.1)")
+    parser.add_argument("--port", type=int, help="HTTP port (MCP_PORT)")
+    parser.add_argument("--path", help="HTTP endpoint path (MCP_PATH; default /sse or /mcp)")
+    parser.add_argument(
+        "--json-response", action=argparse.BooleanOptionalAction, default=None,
+        help="answer streamable-HTTP POSTs with plain JSON (MCP_JSON_RESPONSE; default on)",
+    )
+    parser.add_argument(
+        "--stateless", action="store_const", const=True, default=None,
+        help="stateless streamable HTTP (MCP_STATELESS)",
+    )
+    parser.add_argument("--loop", help="asyncio, uvloop or auto (MCP_LOOP)")
+    parser.add_argument("--max-concurrency", type=int, help="tool calls run at once (MCP_MAX_CONCURRENCY)")
+    parser.add_argument("--rate-limit", type=float, help="tokens per second per HTTP client; 0 disables (MCP_RATE_LIMIT)")
+    parser.add_argument(
+        "--upstream-connections", type=int,
+        help="outbound HTTP connection pool size (MCP_HTTP_MAX_CONNECTIONS)",
+    )
+    parser.add_argument("--compute-workers", type=int, help="calculator compute pool processes (MCP_COMPUTE_WORKERS)")
+    parser.add_argument("--cache-ttl", type=float, help="seconds weather results are reused (MCP_WEATHER_CACHE_TTL)")
+    parser.add_argument("--cache-entries", type=int, help="upstream results kept per upstream (MCP_STALE_MAX_ENTRIES)")
+    parser.add_argument("--hot-locations", metavar="FILE", help="hot-location log for prefetching (MCP_HOT_LOCATIONS_FILE)")
+    parser.add_argument("--log-level", help="root log level (MCP_LOG_LEVEL)")
+    return parser
+
+
+def apply_command_line(argv: list[str] | None = None, default_transport: str = "stdio") -> None:
+    """
+    Apply the command line (and its config file) to the environment. Call it
+    before the server module configures itself, i.e. before it is imported.
+    """
+    parser = build_parser(default_transport)
+    args = parser.parse_args(argv)
+    try:
+        config = load_config(args.config) if args.config else {}
+        for name, value in config.items():
+            os.environ.setdefault(name, value)
+        if default_transport == "stdio":
+            # Only this command line chooses a network transport for a stdio server
+            os.environ["MCP_TRANSPORT"] = config.get("MCP_TRANSPORT", "stdio")
+        else:
+            os.environ.setdefault("MCP_TRANSPORT", default_transport)
+        for dest, name in FLAG_SETTINGS.items():
+            value = getattr(args, dest)
+            if isinstance(value, bool):
+                os.environ[name] = "1" if value else "0"
+            elif value is not None:
+                os.environ[name] = str(value)
+        parse_transports(os.environ["MCP_TRANSPORT"])
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+
+async def serve_transports(app, transports: list[str], settings: HttpSettings) -> None:
+    """Serve `app` on every transport at once, until any of them stops."""
+    runs = []
+    if "stdio" in transports:
+        logger.info("Serving %s over stdio", app.name)
+        runs.append(app.run_stdio_async(show_banner=False))
+    if any(name != "stdio" for name in transports):
+        runs.append(serve(app, settings))
+    tasks = [asyncio.ensure_future(run) for run in runs]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for task in done:
+        # A transport that failed fails the process
+        task.result()
+
+
+def run_server(app, default_port: int, shutdown=None) -> None:
+    """Entry point for the server modules: serve on the configured transports until stopped."""
+    transports = parse_transports(os.environ.get("MCP_TRANSPORT", "stdio"))
+    if "MCP_WORKER_SLOT" in os.environ:
+        # A worker shares the port with its peers; stdio belongs to the supervisor
+        transports = [name for name in transports if name != "stdio"] or ["sse"]
+    settings = HttpSettings.from_env(default_port)
+    try:
+        logger.info("Starting %s (%s)...", app.name, ", ".join(
+            name if name == "stdio" else f"{settings.describe()} at {settings.url}" for name in transports
+        ))
+        run_until_complete(serve_transports(app, transports, settings), settings.loop)
+    except KeyboardInterrupt:
+        logger.info("Server shutdown requested")
+    except Exception as e:
+        logger.error("Fatal error: %s", e, exc_info=True)
+        raise
+    finally:
+        if shutdown is not None:
+            shutdown()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Streaming Statistics
+
+Single-pass, constant-memory aggregation for large numeric inputs:
+compensated (Neumaier) sums, Welford mean/variance, min/max and a merging
+t-digest for approximate quantiles. Inputs can be inline arrays, chunks
+uploaded across several tool calls, or a local text/CSV file (confined to a
+data directory when one is configured).
+"""
+
+import asyncio
+import math
+import os
+import re
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Iterable, Iterator
+
+DEFAULT_PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+_NUMBER_SPLIT = re.compile(r"[\s,;]+")
+
+
+class NeumaierSum:
+    """Compensated summation that stays accurate when magnitudes differ widely."""
+
+    def __init__(self):
+        self.total = 0.0
+        self._compensation = 0.0
+
+    def add(self, x: float) -> None:
+        t = self.total + x
+        if abs(self.total) >= abs(x):
+            self._compensation += (self.total - t) + x
+        else:
+            self._compensation += (x - t) + self.total
+        self.total = t
+
+    @property
+    def value(self) -> float:
+        return self.total + self._compensation
+
+
+class Welford:
+    """Running mean and variance without storing the values."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+    @property
+    def population_variance(self) -> float:
+        return self._m2 / self.count if self.count else math.nan
+
+    @property
+    def sample_variance(self) -> float:
+        return self._m2 / (self.count - 1) if self.count > 1 else math.nan
+
+
+class TDigest:
+    """
+    Merging t-digest for approximate quantiles.
+    Memory is bounded by the compression factor, not by the number of values.
+    """
+
+    def __init__(self, compression: float = 100.0, buffer_size: int = 512):
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self._means: list[float] = []
+        self._weights: list[float] = []
+        self._buffer: list[float] = []
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x: float) -> None:
+        self._buffer.append(x)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        if len(self._buffer) >= self.buffer_size:
+            self._merge()
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _q_limit(self, q: float) -> float:
+        k = self._k(q) + 1
+        if k >= self.compression / 4:
+            return 1.0
+        return (math.sin(2 * math.pi * k / self.compression) + 1) / 2
+
+    def _merge(self) -> None:
+        if not self._buffer:
+            return
+        points = sorted(
+            list(zip(self._means, self._weights)) + [(x, 1.0) for x in self._buffer]
+        )
+        self._buffer = []
+        total = sum(w for _, w in points)
+
+        means, weights = [], []
+        cur_mean, cur_weight = points[0]
+        weight_so_far = 0.0
+        limit = self._q_limit(0.0)
+        for mean, weight in points[1:]:
+            if (weight_so_far + cur_weight + weight) / total <= limit:
+                cur_weight += weight
+                cur_mean += (mean - cur_mean) * weight / cur_weight
+            else:
+                means.append(cur_mean)
+                weights.append(cur_weight)
+                weight_so_far += cur_weight
+                limit = self._q_limit(weight_so_far / total)
+                cur_mean, cur_weight = mean, weight
+        means.append(cur_mean)
+        weights.append(cur_weight)
+        self._means, self._weights = means, weights
+
+    def quantile(self, q: float) -> float:
+        """Estimate the q-th quantile (0 <= q <= 1)."""
+        self._merge()
+        if not self._means:
+            return math.nan
+        if len(self._means) == 1:
+            return self._means[0]
+
+        total = sum(self._weights)
+        target = q * total
+        # Each centroid's mean sits at the middle of its weight; interpolate
+        # between neighbouring centres, and towards min/max at the tails.
+        cumulative = self._weights[0] / 2
+        if target <= cumulative:
+            return self.min + (self._means[0] - self.min) * target / cumulative
+        for i in range(1, len(self._means)):
+            step = (self._weights[i - 1] + self._weights[i]) / 2
+            if target <= cumulative + step:
+                fraction = (target - cumulative) / step
+                return self._means[i - 1] + (self._means[i] - self._means[i - 1]) * fraction
+            cumulative += step
+        tail = self._weights[-1] / 2
+        fraction = min((target - cumulative) / tail, 1.0)
+        return self._means[-1] + (self.max - self._means[-1]) * fraction
+
+
+class StreamingSummary:
+    """One-pass summary combining all of the aggregators above."""
+
+    def __init__(self, compression: float = 100.0):
+        self._sum = NeumaierSum()
+        self._moments = Welford()
+        self._digest = TDigest(compression)
+
+    @property
+    def count(self) -> int:
+        return self._moments.count
+
+    def add(self, x: float) -> None:
+        if math.isnan(x):
+            raise ValueError("NaN is not a valid input value")
+        self._sum.add(x)
+        self._moments.add(x)
+        self._digest.add(x)
+
+    def add_many(self, values: Iterable[float]) -> None:
+        for x in values:
+            self.add(float(x))
+
+    def result(self, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> dict[str, Any]:
+        if self.count == 0:
+            raise ValueError("No values were provided")
+        # Sample variance is undefined for a single value; report null, not NaN
+        variance = self._moments.sample_variance if self.count > 1 else None
+        return {
+            "count": self.count,
+            "sum": self._sum.value,
+            "mean": self._moments.mean,
+            "variance": variance,
+            "population_variance": self._moments.population_variance,
+            "stddev": math.sqrt(variance) if variance is not None else None,
+            "min": self._digest.min,
+            "max": self._digest.max,
+            "percentiles": {
+                f"p{p:g}": self._digest.quantile(p / 100) for p in percentiles
+            },
+        }
+
+
+def iter_numbers_from_file(path: str) -> Iterator[float]:
+    """Yield every number in a text/CSV file, line by line. Non-numeric tokens (headers) are skipped."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            for token in _NUMBER_SPLIT.split(line.strip()):
+                if not token:
+                    continue
+                try:
+                    value = float(token)
+                except ValueError:
+                    continue
+                if not math.isnan(value):
+                    yield value
+
+
+def resolve_data_path(path: str, data_dir: str) -> str:
+    """`path`, relative to `data_dir` or absolute, resolved; PermissionError if it leads outside it."""
+    root = os.path.realpath(data_dir)
+    # realpath follows symlinks and "..", so neither can lead out of the directory
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise PermissionError(f"{path} is outside the data directory")
+    return resolved
+
+
+def summarize_file(path: str, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> dict[str, Any]:
+    """Summarise a numeric file in one streaming pass."""
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"File not found: {path}")
+    summary = StreamingSummary()
+    summary.add_many(iter_numbers_from_file(path))
+    return summary.result(percentiles)
+
+
+class UploadSessions:
+    """
+    Partial summaries for chunked uploads, keyed by upload ID.
+    Only the running aggregates are kept, never the values themselves.
+    """
+
+    def __init__(self, max_sessions: int = 64, idle_timeout: float = 600.0):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions: dict[str, tuple[StreamingSummary, float]] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def _evict_idle(self) -> None:
+        cutoff = time.monotonic() - self.idle_timeout
+        for upload_id, (_, last_used) in list(self._sessions.items()):
+            if last_used < cutoff:
+                self.pop(upload_id)
+
+    def get_or_create(self, upload_id: str | None) -> tuple[str, StreamingSummary]:
+        self._evict_idle()
+        if upload_id is None:
+            if len(self._sessions) >= self.max_sessions:
+                raise RuntimeError("Too many uploads in progress, try again later")
+            upload_id = uuid.uuid4().hex
+            summary = StreamingSummary()
+        elif upload_id in self._sessions:
+            summary = self._sessions[upload_id][0]
+        else:
+            raise ValueError(f"Unknown or expired upload_id '{upload_id}'")
+        self._sessions[upload_id] = (summary, time.monotonic())
+        return upload_id, summary
+
+    @asynccontextmanager
+    async def session(self, upload_id: str | None) -> AsyncIterator[tuple[str, StreamingSummary]]:
+        """
+        Like get_or_create, but held by one call at a time: concurrent chunks
+        of one upload are added in turn, even when added off the event loop.
+        """
+        upload_id, summary = self.get_or_create(upload_id)
+        async with self._locks.setdefault(upload_id, asyncio.Lock()):
+            # Finalized (or expired) while this call waited its turn
+            if upload_id not in self._sessions:
+                raise ValueError(f"Unknown or expired upload_id '{upload_id}'")
+            yield upload_id, summary
+
+    def pop(self, upload_id: str) -> None:
+        self._sessions.pop(upload_id, None)
+        self._locks.pop(upload_id, None)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Tracing
+
+Lightweight span tracing for tool calls, internal steps and outbound HTTP
+requests, with W3C trace-context propagation and an OTLP/JSON exporter.
+
+- TracingMiddleware opens a server span per tool call, continuing the trace
+  from an incoming `traceparent` (HTTP header or the request's `_meta`).
+- `tracer.span("name")` opens a child span around any block of code.
+- `inject_headers(url)` returns the `traceparent` header for an outbound
+  request, only to the hosts listed in MCP_TRACE_PROPAGATE: trace and span
+  IDs are internal, and public APIs have no use for them.
+- Finished spans are batched on a background thread and written as OTLP/JSON
+  (`{"resourceSpans": [...]}`) lines to a file, or POSTed to an OTLP/HTTP
+  collector endpoint.
+
+Configured from the environment:
+    MCP_TRACE_EXPORT     file:/path/to/spans.jsonl  or  http://host:4318/v1/traces
+                         (tracing is disabled when unset)
+    MCP_TRACE_SAMPLE     probability of sampling a new trace (default 1.0)
+    MCP_TRACE_PROPAGATE  comma-separated upstream hosts trusted with traceparent,
+                         or * for all (default: none)
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Any, Iterator
+from urllib.parse import urlsplit
+
+from fastmcp.server.dependencies import get_http_headers
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+logger = logging.getLogger("tracing")
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# OTLP span kinds
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+
+
+class Span:
+    """One timed operation. Unsampled spans keep IDs for propagation but are never exported."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "sampled",
+                 "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str | None, sampled: bool, kind: int):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes: dict[str, Any] = {}
+        self.error: str | None = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.sampled:
+            self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_otlp(self) -> dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar("current_span", default=None)
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str, bool] | None:
+    """(trace_id, parent_span_id, sampled) from a W3C traceparent, or None if invalid."""
+    if not value:
+        return None
+    match = _TRACEPARENT.match(value.strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+class SpanExporter:
+    """Batches finished spans on a background thread and writes them as OTLP/JSON."""
+
+    def __init__(self, target: str, service_name: str, max_queue: int = 10_000, batch_size: int = 256):
+        self.target = target
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue: queue.Queue[Span | None] = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            # Gather whatever else is already waiting, up to one batch
+            while len(batch) < self.batch_size:
+                try:
+                    span = self._queue.get(timeout=0.5)
+                except queue.Empty:
+                    break
+                if span is None:
+                    self._write(batch)
+                    return
+                batch.append(span)
+            self._write(batch)
+
+    def _write(self, batch: list[Span]) -> None:
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "mcp-tracing"},
+                    "spans": [span.to_otlp() for span in batch],
+                }],
+            }]
+        }
+        body = json.dumps(payload, separators=(",", ":"))
+        try:
+            if self.target.startswith("file:"):
+                with open(self.target[len("file:"):], "a", encoding="utf-8") as f:
+                    f.write(body + "\n")
+            else:
+                request = urllib.request.Request(
+                    self.target, data=body.encode(), headers={"Content-Type": "application/json"}
+                )
+                urllib.request.urlopen(request, timeout=5).close()
+        except Exception as e:
+            logger.warning("Span export to %s failed: %s", self.target, e)
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+class Tracer:
+    """Creates spans and decides sampling. Disabled (near zero cost) without an exporter."""
+
+    def __init__(self, exporter: SpanExporter | None = None, sample_ratio: float = 1.0):
+        self.exporter = exporter
+        self.sample_ratio = sample_ratio
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        kind: int = KIND_INTERNAL,
+        traceparent: str | None = None,
+        **attributes: Any,
+    ) -> Iterator[Span | None]:
+        """Open a span as a child of the current one (or continue `traceparent`)."""
+        if self.exporter is None:
+            yield None
+            return
+
+        parent = _current_span.get()
+        remote = parse_traceparent(traceparent) if parent is None else None
+        if parent is not None:
+            span = Span(name, parent.trace_id, parent.span_id, parent.sampled, kind)
+        elif remote is not None:
+            span = Span(name, remote[0], remote[1], remote[2], kind)
+        else:
+            sampled = random.random() < self.sample_ratio
+            span = Span(name, f"{random.getrandbits(128):032x}", None, sampled, kind)
+        if span.sampled:
+            span.attributes.update(attributes)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            if span.sampled:
+                self.exporter.export(span)
+
+
+def propagates_to(url: str) -> bool:
+    """Whether the upstream at `url` is trusted with our trace context (MCP_TRACE_PROPAGATE)."""
+    hosts = {host.strip().lower() for host in os.environ.get("MCP_TRACE_PROPAGATE", "").split(",") if host.strip()}
+    return "*" in hosts or (urlsplit(url).hostname or "") in hosts
+
+
+def inject_headers(url: str, headers: dict[str, str] | None = None) -> dict[str, str]:
+    """Add the current span's traceparent to the headers of a request to `url`, if trusted."""
+    headers = dict(headers or {})
+    span = _current_span.get()
+    if span is not None and propagates_to(url):
+        headers["traceparent"] = span.traceparent
+    return headers
+
+
+def tracer_from_env(service_name: str) -> Tracer:
+    target = os.environ.get("MCP_TRACE_EXPORT", "").strip()
+    if not target:
+        return Tracer()
+    exporter = SpanExporter(target, service_name)
+    atexit.register(exporter.shutdown)
+    sample_ratio = float(os.environ.get("MCP_TRACE_SAMPLE", "1.0"))
+    logger.info("Tracing enabled: exporting to %s (sample ratio %s)", target, sample_ratio)
+    return Tracer(exporter, sample_ratio)
+
+
+def request_meta(context: MiddlewareContext) -> dict[str, Any]:
+    """The request's `_meta` as a plain dict (empty when absent)."""
+    meta = getattr(context.message, "meta", None)
+    if meta is None and context.fastmcp_context is not None:
+        try:
+            meta = context.fastmcp_context.request_context.meta
+        except (AttributeError, RuntimeError):
+            meta = None
+    if meta is None:
+        return {}
+    if isinstance(meta, dict):
+        return meta
+    return meta.model_dump(by_alias=True, exclude_none=True)
+
+
+class TracingMiddleware(Middleware):
+    """Opens a server span per tool call, continuing any incoming trace context."""
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        if not self.tracer.enabled:
+            return await call_next(context)
+
+        # `_meta.traceparent` on the request wins over the HTTP header
+        traceparent = request_meta(context).get("traceparent") or get_http_headers().get("traceparent")
+
+        tool = context.message.name
+        with self.tracer.span(f"tools/call {tool}", KIND_SERVER, traceparent, **{"mcp.tool": tool}):
+            return await call_next(context)
+
+
+_tracer: Tracer | None = None
+
+
+def setup_tracing(app, service_name: str) -> Tracer:
+    """Attach the tracing middleware; the process-wide tracer is created on first use."""
+    global _tracer
+    if _tracer is None:
+        _tracer = tracer_from_env(service_name)
+    app.add_middleware(TracingMiddleware(_tracer))
+    return _tracer
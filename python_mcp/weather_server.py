@@ -4,24 +4,86 @@ Weather MCP Server
 
 An MCP server that provides weather information using the Open-Meteo API.
 Refactored to use FastMCP for cleaner, more maintainable code.
+
+Serves stdio by default; HTTP, or stdio and HTTP at once, with flags:
+    python weather_server.py --transport sse --port 8001
+    python weather_server.py --transport stdio,streamable-http --cache-ttl 600
+(python weather_server.py --help lists them; see server_cli.py and http_serving.py)
 """
 
 import asyncio
+import functools
 import logging
+import os
 import ssl
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+from typing import Any, AsyncIterator
 
 import certifi
-import httpx
-from fastmcp import FastMCP
+from fastmcp import Context, FastMCP
 from geopy.geocoders import Nominatim
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from adaptive_limit import AdaptiveLimiter, RateGate, expose_limits
+from deadlines import DeadlineExceeded, propagate_cancellation, timeout_for
+from hot_locations import hot_locations
+from http_pool import get_client
+from last_known_good import last_known_good, stale_notice
+from log_setup import configure_logging
+from loop_watchdog import watch_loop
+from profiling import enable_profiling
+from progress import Progress
+from admission import admission_control
+from rate_limit import charge_only, rate_limit
+from server_cli import apply_command_line, run_server
+from tracing import KIND_CLIENT, inject_headers, setup_tracing
+from metrics import instrument, upstream_timer
+
+# Run as a script: command-line flags and --config files become the environment
+# settings read below (see server_cli.py)
+if __name__ == "__main__":
+    apply_command_line()
+
+# Configure logging (queued, lazily formatted, per-tool sampling; see log_setup.py)
+configure_logging()
 logger = logging.getLogger("weather-server")
 
+# Rolling log of requested locations, replayed at startup to warm the caches (see hot_locations.py)
+recent_locations = hot_locations()
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    async with recent_locations.running(warm_location):
+        yield
+
+
 # Initialize FastMCP server
-app = FastMCP("weather-server")
+app = FastMCP("weather-server", lifespan=lifespan)
+
+# Per-tool call counts, latency histograms and GET /metrics
+instrument(app)
+
+# Spans per tool call and step, exported when MCP_TRACE_EXPORT is set
+tracer = setup_tracing(app, "weather-server")
+
+# Event-loop lag metric, plus a logged stack whenever a tool blocks the loop
+watch_loop(app)
+
+# Cancel calls at their client's deadline (_meta.timeout_ms / deadline) or when the client goes away
+propagate_cancellation(app)
+
+# Per-client token buckets for HTTP clients (API key or session), charged per tool; runs
+# before admission control so a throttled client never takes a queue slot
+rate_limit(app, costs={"get-current-weather": 5, "get-forecast": 10})
+
+# Concurrency limits with a bounded wait queue; excess calls get "overloaded, retry after".
+# Each forecast holds an upstream request for its whole duration.
+admission_control(app, tool_limits={"get-current-weather": 16, "get-forecast": 8})
+
+# Admin-only /admin/profile/* routes, registered only when MCP_ADMIN_TOKEN is set
+enable_profiling(app)
 
 # Create SSL context with certifi certificates
 try:
@@ -31,22 +93,75 @@ except (PermissionError, OSError):
     logger.warning("Could not use certifi certificates, using default SSL context")
     ssl_context = ssl.create_default_context()
 
+# Upstream endpoints; override to point at a local stand-in (e.g. for benchmark.py)
+OPEN_METEO_URL = os.environ.get("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+NOMINATIM_URL = urlsplit(os.environ.get("NOMINATIM_URL", "https://nominatim.openstreetmap.org"))
+
+# Outbound concurrency per upstream, adapted to its latency and errors (see adaptive_limit.py).
+# Nominatim's usage policy allows about one request per second, hence the low ceiling.
+open_meteo_limit = AdaptiveLimiter("open-meteo", initial=8, max_limit=64)
+nominatim_limit = AdaptiveLimiter("nominatim", initial=1, max_limit=2)
+
+# ...and a concurrency limit alone does not hold the rate to that: Nominatim requests are
+# also paced, at MCP_NOMINATIM_RATE per second shared among the worker processes (workers.py)
+nominatim_pace = RateGate(
+    "nominatim",
+    float(os.environ.get("MCP_NOMINATIM_RATE", "1")) / int(os.environ.get("MCP_WORKER_COUNT", "1")),
+)
+expose_limits(app)
+
+# Upstream timeouts in seconds, shortened to the caller's deadline when that is sooner
+OPEN_METEO_TIMEOUT = 10.0
+GEOCODE_TIMEOUT = 5.0
+
+# Seconds a result is reused without asking again: Open-Meteo updates current
+# conditions every 15 minutes, and places stay put
+WEATHER_CACHE_TTL = float(os.environ.get("MCP_WEATHER_CACHE_TTL", "300"))
+GEOCODE_CACHE_TTL = 86400.0
+
+# Last good result per location (and forecast length): reused within its time to
+# live, then served (labelled as stale) while the upstream fails; see last_known_good.py
+open_meteo_cache = last_known_good("Open-Meteo", ttl=WEATHER_CACHE_TTL)
+geocode_cache = last_known_good("Nominatim", ttl=GEOCODE_CACHE_TTL)
+
+# Geocoding blocks, so it runs in a small pool of its own (sized to the Nominatim
+# ceiling) rather than the loop's default executor. Jobs still queued when their
+# call is cancelled are dropped before they start.
+geocode_executor = ThreadPoolExecutor(max_workers=nominatim_limit.max_limit, thread_name_prefix="geocode")
+
 # Initialize geocoder for location lookups with SSL context
-geolocator = Nominatim(user_agent="mcp-weather-server", ssl_context=ssl_context)
+geolocator = Nominatim(
+    user_agent="mcp-weather-server",
+    ssl_context=ssl_context,
+    domain=NOMINATIM_URL.netloc,
+    scheme=NOMINATIM_URL.scheme,
+)
+
+
+async def geocode(location: str) -> tuple[float, float] | None:
+    """Look a location name up with Nominatim."""
+    loop = asyncio.get_running_loop()
+    with tracer.span("geocode", KIND_CLIENT, **{"peer.service": "nominatim"}):
+        await nominatim_pace.wait()
+        async with nominatim_limit.slot(), upstream_timer("nominatim"):
+            # Run geocoding in its thread pool since it's synchronous
+            lookup = functools.partial(geolocator.geocode, location, timeout=timeout_for(GEOCODE_TIMEOUT))
+            geo_location = await loop.run_in_executor(geocode_executor, lookup)
+
+    if geo_location:
+        return (geo_location.latitude, geo_location.longitude)
+    return None
 
 
 async def get_coordinates(location: str) -> tuple[float, float] | None:
     """Convert a location name to coordinates using geocoding."""
     try:
-        # Run geocoding in thread pool since it's synchronous
-        loop = asyncio.get_event_loop()
-        geo_location = await loop.run_in_executor(None, geolocator.geocode, location)
-
-        if geo_location:
-            return (geo_location.latitude, geo_location.longitude)
-        return None
+        coordinates, _ = await geocode_cache.fetch(location.strip().lower(), lambda: geocode(location))
+        return coordinates
+    except DeadlineExceeded:
+        raise
     except Exception as e:
-        logger.error(f"Geocoding error: {e}")
+        logger.error("Geocoding error: %s", e)
         return None
 
 
@@ -54,7 +169,7 @@ async def fetch_weather(
     latitude: float, longitude: float, forecast_days: int = 1
 ) -> dict[str, Any]:
     """Fetch weather data from Open-Meteo API."""
-    base_url = "https://api.open-meteo.com/v1/forecast"
+    base_url = OPEN_METEO_URL
 
     params = {
         "latitude": latitude,
@@ -65,12 +180,38 @@ async def fetch_weather(
         "forecast_days": forecast_days,
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(base_url, params=params)
-        response.raise_for_status()
+    with tracer.span("GET open-meteo", KIND_CLIENT, **{"http.url": base_url}) as span:
+        async with open_meteo_limit.slot(), upstream_timer("open-meteo"):
+            response = await get_client().get(
+                base_url, params=params, headers=inject_headers(base_url), timeout=timeout_for(OPEN_METEO_TIMEOUT)
+            )
+            if span is not None:
+                span.set_attribute("http.status_code", response.status_code)
+            response.raise_for_status()
+    with tracer.span("decode-json"):
         return response.json()
 
 
+async def fetch_weather_or_stale(
+    latitude: float, longitude: float, forecast_days: int = 1
+) -> tuple[dict[str, Any], float | None]:
+    """Fetch weather data; while Open-Meteo fails, the last good data and its age instead."""
+    # Two decimals is about a kilometre, so repeated lookups of a place share an entry
+    key = (round(latitude, 2), round(longitude, 2), forecast_days)
+    fetched = False
+
+    async def fetch() -> dict[str, Any]:
+        nonlocal fetched
+        fetched = True
+        return await fetch_weather(latitude, longitude, forecast_days)
+
+    result = await open_meteo_cache.fetch(key, fetch)
+    if not fetched:
+        # Answered without going upstream: charged like any other tool call
+        charge_only(1)
+    return result
+
+
 def weather_code_to_description(code: int) -> str:
     """Convert WMO weather code to human-readable description."""
     weather_codes = {
@@ -102,13 +243,10 @@ def weather_code_to_description(code: int) -> str:
     return weather_codes.get(code, f"Unknown (code: {code})")
 
 
-def format_weather_response(data: dict[str, Any], location: str) -> str:
-    """Format weather data into a readable string."""
+def format_current_weather(data: dict[str, Any], location: str) -> str:
+    """The current-conditions part of a weather response."""
     current = data.get("current", {})
-    daily = data.get("daily", {})
-
-    # Current weather
-    result = [
+    return "\n".join([
         f"Weather for {location}",
         f"\n=== Current Weather ===",
         f"Temperature: {current.get('temperature_2m', 'N/A')}°C",
@@ -118,26 +256,36 @@ def format_weather_response(data: dict[str, Any], location: str) -> str:
         f"Wind Speed: {current.get('wind_speed_10m', 'N/A')} km/h",
         f"Wind Direction: {current.get('wind_direction_10m', 'N/A')}°",
         f"Conditions: {weather_code_to_description(current.get('weather_code', 0))}",
-    ]
-
-    # Daily forecast
-    if daily and len(daily.get("time", [])) > 0:
-        result.append("\n=== Forecast ===")
-        for i in range(len(daily.get("time", []))):
-            date = daily["time"][i]
-            temp_max = daily["temperature_2m_max"][i]
-            temp_min = daily["temperature_2m_min"][i]
-            precip = daily["precipitation_sum"][i]
-            conditions = weather_code_to_description(daily["weather_code"][i])
-
-            result.append(
-                f"\n{date}:\n"
-                f"  High: {temp_max}°C, Low: {temp_min}°C\n"
-                f"  Precipitation: {precip} mm\n"
-                f"  Conditions: {conditions}"
-            )
+    ])
+
+
+def format_forecast_days(data: dict[str, Any]) -> list[str]:
+    """One entry per forecast day of a weather response."""
+    daily = data.get("daily") or {}
+    days = []
+    for i in range(len(daily.get("time", []))):
+        date = daily["time"][i]
+        temp_max = daily["temperature_2m_max"][i]
+        temp_min = daily["temperature_2m_min"][i]
+        precip = daily["precipitation_sum"][i]
+        conditions = weather_code_to_description(daily["weather_code"][i])
+
+        days.append(
+            f"\n{date}:\n"
+            f"  High: {temp_max}°C, Low: {temp_min}°C\n"
+            f"  Precipitation: {precip} mm\n"
+            f"  Conditions: {conditions}"
+        )
+    return days
+
+
+def join_weather_response(current: str, days: list[str]) -> str:
+    return "\n".join([current, "\n=== Forecast ===", *days] if days else [current])
 
-    return "\n".join(result)
+
+def format_weather_response(data: dict[str, Any], location: str) -> str:
+    """Format weather data into a readable string."""
+    return join_weather_response(format_current_weather(data, location), format_forecast_days(data))
 
 
 def parse_location(location: str) -> tuple[tuple[float, float], str] | None:
@@ -179,14 +327,19 @@ async def get_current_weather(
         if not coordinates:
             return f"Error: Could not find location '{location}'"
         display_location = location
+    recent_locations.record(location.strip(), 1)
 
     try:
-        weather_data = await fetch_weather(
+        weather_data, stale_age = await fetch_weather_or_stale(
             coordinates[0], coordinates[1], forecast_days=1
         )
-        return format_weather_response(weather_data, display_location)
+        with tracer.span("format_weather_response"):
+            response = format_weather_response(weather_data, display_location)
+        if stale_age is not None:
+            response = stale_notice("Open-Meteo", stale_age) + response
+        return response
     except Exception as e:
-        logger.error(f"Weather fetch error: {e}", exc_info=True)
+        logger.error("Weather fetch error: %s", e, exc_info=True)
         return f"Error fetching weather data: {str(e)}"
 
 
@@ -197,8 +350,9 @@ async def get_current_weather(
 async def get_forecast(
     location: str = "City name, address, or coordinates (e.g., 'London', 'New York, USA', or '51.5074,-0.1278')",
     days: int = 7,
+    ctx: Context | None = None,
 ) -> str:
-    """Get weather forecast for a location."""
+    """Get weather forecast for a location, reporting progress while it is fetched."""
     if not location:
         return "Error: Location is required"
 
@@ -207,6 +361,8 @@ async def get_forecast(
         return "Error: Days must be between 1 and 16"
 
     days = int(days)
+    # The Open-Meteo request is the slow part: say what is being fetched, then that it arrived
+    progress = Progress(ctx, total=1)
 
     # Try to parse as coordinates first
     parsed = parse_location(location)
@@ -218,23 +374,33 @@ async def get_forecast(
         if not coordinates:
             return f"Error: Could not find location '{location}'"
         display_location = location
+    recent_locations.record(location.strip(), days)
 
     try:
-        weather_data = await fetch_weather(
+        await progress.update(0, f"Fetching a {days}-day forecast for {display_location}")
+        weather_data, stale_age = await fetch_weather_or_stale(
             coordinates[0], coordinates[1], forecast_days=days
         )
-        return format_weather_response(weather_data, display_location)
+        with tracer.span("format_weather_response"):
+            current = format_current_weather(weather_data, display_location)
+            forecast = format_forecast_days(weather_data)
+        if stale_age is not None:
+            current = stale_notice("Open-Meteo", stale_age) + current
+        await progress.advance()
+        return join_weather_response(current, forecast)
     except Exception as e:
-        logger.error(f"Weather fetch error: {e}", exc_info=True)
+        logger.error("Weather fetch error: %s", e, exc_info=True)
         return f"Error fetching weather data: {str(e)}"
 
 
+async def warm_location(location: str, days: int) -> None:
+    """Look a location and its weather up as the tools would, filling the caches."""
+    parsed = parse_location(location)
+    coordinates = parsed[0] if parsed else await get_coordinates(location)
+    if not coordinates:
+        raise LookupError(f"Could not find location '{location}'")
+    await fetch_weather_or_stale(coordinates[0], coordinates[1], forecast_days=days)
+
+
 if __name__ == "__main__":
-    try:
-        logger.info("Starting Weather MCP Server with FastMCP...")
-        app.run()
-    except KeyboardInterrupt:
-        logger.info("Server shutdown requested")
-    except Exception as e:
-        logger.error(f"Fatal error: {e}", exc_info=True)
-        raise
+    run_server(app, default_port=8001)
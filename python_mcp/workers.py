@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+Multi-Worker HTTP Serving
+
+Runs several worker processes of one HTTP server behind a single port:
+
+    python workers.py calculator_server_http.py --workers 4
+    MCP_WORKERS=4 ./run_http_servers.sh
+
+- Every worker binds the public port with SO_REUSEPORT, so the kernel spreads
+  new connections across them and throughput scales with cores.
+- Session affinity: an SSE stream lives in the worker that accepted the GET,
+  but the client's follow-up POSTs may land anywhere. Each worker also listens
+  on a private loopback port; a request for a session the worker does not
+  own is relayed to the peer that does (learned once, then cached). The same
+  applies to stateful streamable-HTTP sessions; stateless ones need no relay.
+- The supervisor holds the private ports for as long as it runs: it keeps
+  them bound, without listening, with SO_REUSEPORT, which lets only a
+  worker bind them and still refuses connections while no worker listens.
+- GET /health answers on every worker; the supervisor polls it and restarts
+  workers that exit or stop answering.
+- SIGHUP performs a rolling reload: each worker is replaced by a new one,
+  which must become healthy before the old one is drained and stopped. The
+  public port never stops accepting. Streams held by a replaced worker end
+  and their clients reconnect. A replacement that never becomes healthy is
+  stopped instead, the old worker keeps serving, and the reload stops there.
+- A worker that cannot be replaced is retried after a delay that doubles on
+  each failure (up to MAX_RESTART_DELAY), not on every health check.
+
+The supervisor never imports the server itself; workers are the server
+script run with MCP_WORKER_SLOT / MCP_WORKER_COUNT / MCP_PRIVATE_PORT /
+MCP_PEER_PORTS set.
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from typing import Any
+from urllib.parse import parse_qs
+
+import httpx
+
+from metrics import REGISTRY
+
+logger = logging.getLogger("workers")
+
+HEALTH_PATH = "/health"
+RELAY_HEADER = b"x-mcp-relayed"
+MAX_TRACKED_SESSIONS = 100_000
+RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 60.0
+
+REGISTRY.describe("session_relays_total", "Requests relayed to the worker owning their session.")
+
+_SSE_SESSION = re.compile(rb"session_id=([0-9a-fA-F-]+)")
+_HOP_BY_HOP = {b"connection", b"keep-alive", b"transfer-encoding", b"upgrade", b"host"}
+
+
+# ============================================================================
+# WORKER SIDE
+# ============================================================================
+
+def reuse_port_supported() -> bool:
+    return hasattr(socket, "SO_REUSEPORT") and sys.platform.startswith("linux")
+
+
+def bind_socket(host: str, port: int, reuse_port: bool = False, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+
+def _session_id(scope: dict) -> str | None:
+    for name, value in scope["headers"]:
+        if name == b"mcp-session-id":
+            return value.decode("latin-1")
+    query = scope.get("query_string", b"")
+    if b"session_id=" in query:
+        values = parse_qs(query.decode("latin-1")).get("session_id")
+        if values:
+            return values[0]
+    return None
+
+
+class HealthCheck:
+    """ASGI wrapper answering GET /health without touching the MCP app."""
+
+    def __init__(self, app, worker: int | None = None):
+        self.app = app
+        self.body = json.dumps({"status": "ok", "pid": os.getpid(), "worker": worker}).encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == HEALTH_PATH and scope["method"] == "GET":
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(self.body)).encode())],
+            })
+            await send({"type": "http.response.body", "body": self.body})
+            return
+        await self.app(scope, receive, send)
+
+
+class SessionRelay:
+    """
+    ASGI wrapper giving sessions worker affinity. Sessions created here are
+    recorded from the response (the mcp-session-id header, or the session_id
+    in the SSE endpoint event); requests for any other session are relayed to
+    the peer worker that owns it.
+    """
+
+    def __init__(self, app, peer_ports: list[int]):
+        self.app = app
+        self.peer_ports = peer_ports
+        self.local: OrderedDict[str, None] = OrderedDict()
+        self.owners: OrderedDict[str, int] = OrderedDict()
+        self._client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=None))
+
+    def _remember(self, table: OrderedDict, key: str, value: Any) -> None:
+        table[key] = value
+        table.move_to_end(key)
+        if len(table) > MAX_TRACKED_SESSIONS:
+            table.popitem(last=False)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        session = _session_id(scope)
+        relayed = any(name == RELAY_HEADER for name, _ in scope["headers"])
+        if session is None or relayed or session in self.local:
+            await self.app(scope, receive, self._tracking(scope, send))
+            if scope["method"] == "DELETE" and session is not None:
+                self.local.pop(session, None)
+            return
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+        if await self._relay(scope, body, send, session):
+            return
+
+        # No peer knows it either: let the local app answer (usually 404)
+        async def replay():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, replay, self._tracking(scope, send))
+
+    def _tracking(self, scope, send):
+        """Wrap `send` to record sessions created by this worker."""
+        sse_stream = scope["method"] == "GET"
+        found: list[str] = []
+
+        async def tracking_send(message):
+            if message["type"] == "http.response.start":
+                for name, value in message.get("headers", []):
+                    if name.lower() == b"mcp-session-id":
+                        self._remember(self.local, value.decode("latin-1"), None)
+            elif message["type"] == "http.response.body" and sse_stream:
+                if not found:
+                    match = _SSE_SESSION.search(message.get("body", b""))
+                    if match:
+                        found.append(match.group(1).decode())
+                        self._remember(self.local, found[0], None)
+                if found and not message.get("more_body", False):
+                    # The SSE stream ended, and its session with it
+                    self.local.pop(found[0], None)
+            await send(message)
+
+        return tracking_send
+
+    async def _relay(self, scope, body: bytes, send, session: str) -> bool:
+        # The owner answers uncompressed: this worker's response shaping
+        # compresses on the way out, once
+        headers = [(k, v) for k, v in scope["headers"] if k not in _HOP_BY_HOP and k != b"accept-encoding"]
+        headers.append((RELAY_HEADER, b"1"))
+        path = scope["raw_path"].decode("latin-1") if scope.get("raw_path") else scope["path"]
+        if scope.get("query_string") and "?" not in path:
+            path += "?" + scope["query_string"].decode("latin-1")
+
+        known = self.owners.get(session)
+        candidates = ([known] if known else []) + [p for p in self.peer_ports if p != known]
+        for port in candidates:
+            request = self._client.build_request(
+                scope["method"], f"http://127.0.0.1:{port}{path}", headers=headers, content=body
+            )
+            try:
+                response = await self._client.send(request, stream=True)
+            except Exception:
+                continue  # peer not running (e.g. a reload bank not in use)
+            if response.status_code == 404:
+                await response.aclose()
+                continue
+            self._remember(self.owners, session, port)
+            REGISTRY.inc("session_relays_total")
+            try:
+                await send({
+                    "type": "http.response.start",
+                    "status": response.status_code,
+                    "headers": [
+                        (k, v) for k, v in response.headers.raw if k.lower() not in _HOP_BY_HOP
+                    ],
+                })
+                async for chunk in response.aiter_raw():
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                await send({"type": "http.response.body", "body": b""})
+            finally:
+                await response.aclose()
+            return True
+        self.owners.pop(session, None)
+        return False
+
+
+def _exit_with_supervisor(interval: float = 1.0) -> None:
+    """Stop this worker if its supervisor goes away without stopping it (e.g. SIGKILL)."""
+    supervisor = os.getppid()
+
+    def watch() -> None:
+        while os.getppid() == supervisor:
+            time.sleep(interval)
+        logger.warning("Supervisor %d exited; stopping worker", supervisor)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    threading.Thread(target=watch, name="supervisor-watch", daemon=True).start()
+
+
+def worker_setup(asgi_app, settings) -> tuple[Any, list[socket.socket]]:
+    """Sockets and ASGI wrappers for one worker process (see HttpSettings.worker_slot)."""
+    _exit_with_supervisor()
+    public = bind_socket(settings.host, settings.port, reuse_port=True, backlog=settings.backlog)
+    # Alongside the supervisor's reservation (see reserve_ports)
+    private = bind_socket("127.0.0.1", settings.private_port, reuse_port=True)
+    peers = [port for port in settings.peer_ports if port != settings.private_port]
+    wrapped = HealthCheck(SessionRelay(asgi_app, peers), worker=settings.worker_slot)
+    return wrapped, [public, private]
+
+
+# ============================================================================
+# SUPERVISOR
+# ============================================================================
+
+def reserve_ports(count: int) -> list[socket.socket]:
+    """
+    Hold `count` loopback ports for workers: bound with SO_REUSEPORT but not
+    listening, so nothing else can take them between the worker processes
+    starting and binding them, and connecting to one no worker has bound yet
+    is refused rather than left waiting.
+    """
+    sockets = []
+    try:
+        for _ in range(count):
+            sock = socket.socket()
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            sock.bind(("127.0.0.1", 0))
+            sockets.append(sock)
+    except BaseException:
+        for sock in sockets:
+            sock.close()
+        raise
+    return sockets
+
+
+def free_ports(count: int) -> list[int]:
+    """Ask the kernel for `count` currently free loopback ports (free until someone binds them)."""
+    sockets = []
+    try:
+        for _ in range(count):
+            sock = socket.socket()
+            sock.bind(("127.0.0.1", 0))
+            sockets.append(sock)
+        return [sock.getsockname()[1] for sock in sockets]
+    finally:
+        for sock in sockets:
+            sock.close()
+
+
+class Worker:
+    def __init__(self, slot: int, port: int, process: subprocess.Popen):
+        self.slot = slot
+        self.port = port
+        self.process = process
+        self.started = time.monotonic()
+        self.failures = 0
+        # Failed attempts to replace this worker, and when to try again
+        self.replace_failures = 0
+        self.retry_at = 0.0
+
+    def healthy(self, timeout: float = 2.0) -> bool:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{self.port}{HEALTH_PATH}", timeout=timeout) as r:
+                return r.status == 200
+        except Exception:
+            return False
+
+    def stop(self, grace: float = 10.0) -> None:
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(grace)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+
+class Supervisor:
+    """Starts, health-checks, restarts and rolling-reloads the worker processes."""
+
+    def __init__(
+        self,
+        script: str,
+        workers: int,
+        env: dict[str, str] | None = None,
+        health_interval: float = 5.0,
+        max_health_failures: int = 3,
+        startup_timeout: float = 60.0,
+    ):
+        self.script = os.path.abspath(script)
+        self.count = workers
+        self.env = {**os.environ, **(env or {})}
+        self.health_interval = health_interval
+        self.max_health_failures = max_health_failures
+        self.startup_timeout = startup_timeout
+        # Two banks of private ports, so a replacement can start before the old worker stops
+        self._reserved = reserve_ports(2 * workers) if reuse_port_supported() else []
+        self.private_ports = [sock.getsockname()[1] for sock in self._reserved]
+        self.workers: list[Worker] = []
+        self._reload = False
+        self._stopping = False
+
+    def _spawn(self, slot: int) -> Worker:
+        port = self.private_ports[slot]
+        env = {
+            **self.env,
+            "MCP_WORKER_SLOT": str(slot),
+            # For budgets shared by all workers, such as an upstream's rate limit
+            "MCP_WORKER_COUNT": str(self.count),
+            "MCP_PRIVATE_PORT": str(port),
+            "MCP_PEER_PORTS": ",".join(map(str, self.private_ports)),
+        }
+        process = subprocess.Popen([sys.executable, self.script], env=env, cwd=os.path.dirname(self.script))
+        logger.info("Started worker slot %d (pid %d, private port %d)", slot, process.pid, port)
+        return Worker(slot, port, process)
+
+    def _free_slot(self) -> int:
+        used = {worker.slot for worker in self.workers}
+        return next(slot for slot in range(len(self.private_ports)) if slot not in used)
+
+    def _wait_healthy(self, worker: Worker) -> bool:
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline and not self._stopping:
+            if worker.process.poll() is not None:
+                return False
+            if worker.healthy(timeout=1.0):
+                return True
+            time.sleep(0.2)
+        return False
+
+    def _replace(self, old: Worker, reason: str) -> bool:
+        """Swap `old` for a new worker once that is healthy; False (keeping `old`) if it never is."""
+        logger.warning("Replacing worker slot %d (pid %d): %s", old.slot, old.process.pid, reason)
+        new = self._spawn(self._free_slot())
+        self.workers.append(new)
+        if not self._wait_healthy(new):
+            self.workers.remove(new)
+            new.stop()
+            old.replace_failures += 1
+            delay = min(MAX_RESTART_DELAY, RESTART_DELAY * 2 ** (old.replace_failures - 1))
+            old.retry_at = time.monotonic() + delay
+            logger.error(
+                "Replacement for worker slot %d did not become healthy; keeping the old one, retrying in %.0fs",
+                old.slot, delay,
+            )
+            return False
+        self.workers.remove(old)
+        old.stop()
+        return True
+
+    def rolling_reload(self) -> None:
+        logger.warning("Rolling reload of %d workers", len(self.workers))
+        for old in list(self.workers):
+            if self._stopping:
+                return
+            if not self._replace(old, "reload"):
+                logger.error("Rolling reload aborted; the remaining workers keep the old code")
+                return
+
+    def check(self) -> None:
+        for worker in list(self.workers):
+            if time.monotonic() < worker.retry_at:
+                continue
+            if worker.process.poll() is not None:
+                self._replace(worker, f"exited with code {worker.process.returncode}")
+            elif worker.healthy():
+                worker.failures = 0
+            else:
+                worker.failures += 1
+                if worker.failures >= self.max_health_failures:
+                    self._replace(worker, f"failed {worker.failures} health checks")
+
+    def _on_hup(self, signum, frame) -> None:
+        self._reload = True
+
+    def _on_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def run(self) -> int:
+        if not reuse_port_supported():
+            logger.error("SO_REUSEPORT is not available on this platform; run a single worker instead")
+            return 1
+        signal.signal(signal.SIGHUP, self._on_hup)
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+
+        self.workers = [self._spawn(slot) for slot in range(self.count)]
+        for worker in self.workers:
+            self._wait_healthy(worker)
+        logger.info("%d workers ready", len(self.workers))
+
+        next_check = time.monotonic() + self.health_interval
+        while not self._stopping:
+            time.sleep(0.2)
+            if self._reload:
+                self._reload = False
+                self.rolling_reload()
+            elif time.monotonic() >= next_check:
+                self.check()
+                next_check = time.monotonic() + self.health_interval
+
+        logger.info("Stopping %d workers", len(self.workers))
+        for worker in self.workers:
+            if worker.process.poll() is None:
+                worker.process.terminate()
+        for worker in self.workers:
+            worker.stop()
+        self.close()
+        return 0
+
+    def close(self) -> None:
+        """Give up the private ports."""
+        for sock in self._reserved:
+            sock.close()
+        self._reserved = []
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run an MCP HTTP server as several worker processes.")
+    parser.add_argument("script", help="server script, e.g. calculator_server_http.py")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("MCP_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--health-interval", type=float, default=5.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    supervisor = Supervisor(args.script, max(1, args.workers), health_interval=args.health_interval)
+    return supervisor.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())